@@ -2,6 +2,8 @@ import os
 import numpy as np
 import pandas as pd
 import math
+from collections import OrderedDict
+from functools import lru_cache, partial
 
 
 from mpa_sim.services.tools import Calculator
@@ -30,6 +32,9 @@ class Cost(object):
         self.simulation_parameters = simulation_parameters
         self.cost_parameters = cost_parameters
         self.calculator = Calculator(simulation_parameters = simulation_parameters)
+        self._server_plans = OrderedDict()
+        self._catalogs = {}
+        self._max_server_plans = 1024
 
     def get_sites_per_km2(self, site_radius) -> float:
         """
@@ -69,48 +74,98 @@ class Cost(object):
                 total cost of the ownership over the asset lifetime considering the discount 
                 
         """
-        asset_lifetime = self.simulation_parameters['asset_lifetime']
-        discount_rate = self.simulation_parameters['discount_rate'] / 100
+        factor = annuity_factor(self.simulation_parameters['asset_lifetime'],
+                                self.simulation_parameters['discount_rate'] / 100)
 
         if capex:
             capex = cost
 
             opex = round(capex * (self.simulation_parameters['opex_percentage_of_capex'] / 100))
 
-            total_cost_of_ownership = 0
-            total_cost_of_ownership += capex
-
-            for i in range(0, asset_lifetime ):
-                total_cost_of_ownership += (
-                    opex / (1 + discount_rate) ** i
-                )
+            total_cost_of_ownership = capex + opex * factor
         else:
             opex = cost
-            total_cost_of_ownership = 0
-
-            for i in range(0, asset_lifetime ):
-                total_cost_of_ownership += (
-                    opex / (1 + discount_rate) ** i
-                )
+            total_cost_of_ownership = opex * factor
 
         return total_cost_of_ownership
 
+    def discount_ownership_costs(self, costs, capex):
+        """
+        Array version of discount_ownership_cost.
+
+        Parameters
+        ----------
+        costs : array_like
+            costs to discount.
+        capex : boolean or array_like of booleans
+            specifies for each cost if it is a capex (True) or opex (False)
+
+        Returns
+        -------
+            total_cost_of_ownership : numpy.ndarray
+                total cost of the ownership over the asset lifetime of each cost
+                
+        """
+        costs = np.asarray(costs, dtype=float)
+        capex = np.asarray(capex, dtype=bool)
+
+        factor = annuity_factor(self.simulation_parameters['asset_lifetime'],
+                                self.simulation_parameters['discount_rate'] / 100)
+
+        opex = np.where(
+            capex,
+            np.round(costs * (self.simulation_parameters['opex_percentage_of_capex'] / 100)),
+            costs)
+
+        return np.where(capex, costs, 0) + opex * factor
+
     def cost_optimized(self, component, **kwargs):
-        selected_idx = -1
-        for idx , val in enumerate(self.cost_parameters[component]):
-            selected = True
-            for key, value in kwargs.items():
-                if self.cost_parameters[component][idx][key] < value:
-                    selected = False
-                    break
-            if selected:
-                if selected_idx == -1: 
-                    selected_idx = idx
-                else: 
-                    if self.cost_parameters[component][idx]['price'] < self.cost_parameters[component][selected_idx]['price']:
-                        selected_idx = idx
+        """
+
+        Cheapest item of a component meeting all minimum requirements.
+
+        Parameters
+        ----------
+        component : str
+            Key of the component in cost_parameters.
+        kwargs : float
+            Minimum value of each attribute, e.g. speed = 10.
+
+        Returns
+        -------
+        item : dict
+            The cheapest matching item, the first listed one on equal
+            prices, or the last listed item if none matches.
+
+        """
+        return self._catalog(component).select(**kwargs)
+
+    def _catalog(self, component):
+        items = self.cost_parameters[component]
+
+        catalog = self._catalogs.get(component)
+        if catalog is None or catalog.items is not items or len(catalog) != len(items):
+            catalog = ComponentCatalog(items)
+            self._catalogs[component] = catalog
+
+        return catalog
+
+    def _cost_optimized_batch(self, component, n, key='price', **kwargs):
+        """
+
+        Attribute of the item cost_optimized selects, for arrays of minimums.
+
+        """
+        catalog = self._catalog(component)
+        if not kwargs:
+            return np.full(n, float(catalog.select()[key]))
+
+        kwargs = {
+            name: np.broadcast_to(np.asarray(value, dtype=float), (n,))
+            for name, value in kwargs.items()
+        }
 
-        return self.cost_parameters[component][selected_idx]
+        return catalog.column(key)[catalog.indices(**kwargs)]
 
     def serv_cost(self, cpu_util, max_utilization = 80):
         """
@@ -141,21 +196,43 @@ class Cost(object):
 
         """
 
+        # server plans are cached per utilization and every parameter
+        # they depend on, so a changed parameter never returns a stale plan
+        cpu = self.cost_parameters['cpu'][0]
+        server = self.cost_parameters['server'][0]
+        key = (cpu_util, max_utilization,
+               self.simulation_parameters['type_of_server'],
+               self.simulation_parameters['type_of_virtualization'],
+               self.simulation_parameters['prop_or_not'],
+               self.simulation_parameters['n_virtual_machines'],
+               cpu['cores'], cpu['price'], server['cpu_max'], server['price'])
+
+        plan = self._server_plans.get(key)
+        if plan is not None:
+            self._server_plans.move_to_end(key)
+            return dict(plan)
+
         #combining overhead calculation with cost calculation
         max_utilization = max_utilization - overhead_per_server(self.simulation_parameters['type_of_server'],self.simulation_parameters['type_of_virtualization'],self.simulation_parameters['prop_or_not'],self.simulation_parameters['n_virtual_machines'])
 
         number_of_cores = cpu_util / max_utilization
-        number_of_cpus = number_of_cores / self.cost_parameters['cpu'][0]['cores']
-        cpu_price = number_of_cpus * self.cost_parameters['cpu'][0]['price']
+        number_of_cpus = number_of_cores / cpu['cores']
+        cpu_price = number_of_cpus * cpu['price']
 
-        number_of_servers = number_of_cpus / self.cost_parameters['server'][0]['cpu_max']
-        server_price = number_of_servers * self.cost_parameters['server'][0]['price']
+        number_of_servers = number_of_cpus / server['cpu_max']
+        server_price = number_of_servers * server['price']
 
-        return {"cpu_price": cpu_price, 
+        plan = {"cpu_price": cpu_price, 
                 "server_price": server_price, 
                 "number_of_cpus": number_of_cpus,
                 "number_of_servers": number_of_servers}
 
+        self._server_plans[key] = plan
+        if len(self._server_plans) > self._max_server_plans:
+            self._server_plans.popitem(last=False)
+
+        return dict(plan)
+
     def get_cost(self, sites_per_km2, capacity_gbps, rudu_distance, ducu_distance, CUCP_utils, CUUP_utils, DU_utils):
         """
 
@@ -196,249 +273,398 @@ class Cost(object):
 
         """
 
-        sites_per_du = sites_per_km2 * self.simulation_parameters['sectorization'] / self.simulation_parameters['ru_du_ratio']
+        def price(component, key='price', **kwargs):
+            return self.cost_optimized(component, **kwargs)[key]
+
+        # one server plan per utilization, shared by both breakdowns
+        plans = [self.serv_cost(utils) for utils in (CUCP_utils, CUUP_utils, DU_utils)]
+
+        cost_breakdown, components_breakdown = self._breakdowns(
+            price, self.discount_ownership_cost, plans,
+            sites_per_km2, capacity_gbps, rudu_distance, ducu_distance)
+
+        return {"cost_breakdown": cost_breakdown, "components_breakdown": components_breakdown}
+
+    def _breakdowns(self, price, discount, plans, sites_per_km2, capacity_gbps, rudu_distance, ducu_distance):
+        """
+
+        Cost and components breakdowns shared by get_cost and get_cost_batch.
+
+        price(component, key='price', **minimums) returns an attribute of
+        the selected catalog item, discount is discount_ownership_cost or
+        its array version and plans are the CU-CP, CU-UP and DU server
+        plans, so the same formulas serve scalars and arrays.
+
+        """
+        sectorization = self.simulation_parameters['sectorization']
+        ru_du_ratio = self.simulation_parameters['ru_du_ratio']
+        signaling_overhead = self.simulation_parameters['signaling_overhead']
+
+        sites_per_du = sites_per_km2 * sectorization / ru_du_ratio
         FH_tput = self.calculator.ecpri_throughput()
-        
-        cost_breakdown = {
-            'single_sector_antenna': (
-                self.discount_ownership_cost(
-                    self.cost_optimized(
-                        'single_sector_antenna'
-                    )['price'], 1) * 
-                    self.simulation_parameters['sectorization'] *
-                    sites_per_km2
-            ),
-            'ru': (
-                self.discount_ownership_cost(
-                    self.cost_optimized(
-                        'ru'
-                    )['price'], 1) * 
-                    self.simulation_parameters['sectorization'] *
-                    sites_per_km2
-            ),
-            'tower': (
-                self.cost_optimized(
-                    'tower'
-                )['price'] *
-                sites_per_km2
-            ),  
-            'transportation': (
-                self.cost_optimized(
-                    'transportation'
-                )['price'] *
-                sites_per_km2
-            ),          
-            'installation': (
-                self.cost_optimized(
-                    'installation'
-                )['price'] *
-                sites_per_km2
-            ),
-            'site_rental': (
-                self.discount_ownership_cost(
-                    self.cost_optimized(
-                        'site_rental'
-                    )['price'], 0) *
-                sites_per_km2
-            ),
-            'power_generator_battery_system': (
-                self.discount_ownership_cost(
-                    self.cost_optimized(
-                        'power_generator_battery_system'
-                    )['price'], 1) *
-                sites_per_km2
-            ),
-            'fiber_switch': (
-                self.discount_ownership_cost(
-                    self.cost_optimized(
-                        'switch',
-                        ports = self.simulation_parameters['sectorization'] + 1,
-                        speed = capacity_gbps * self.simulation_parameters['sectorization']
-                    )['price'], 1) *
-                sites_per_km2
-            ),
-            'sfp_ru': (
-                self.discount_ownership_cost(
-                    self.cost_optimized(
-                        'sfp',
-                        distance = rudu_distance, #15Km
-                        speed = capacity_gbps * self.simulation_parameters['sectorization']
-                    )['price'], 1) * 2 * # one on the ru side and one in du
-                sites_per_km2
-            ),
-            'sfp_sectors': (
-                self.discount_ownership_cost(
-                    self.cost_optimized(
-                        'sfp',
-                        distance = 100, #meters
-                        speed = capacity_gbps
-                    )['price'], 1) *
-                self.simulation_parameters['sectorization'] *
-                sites_per_km2
-            ),
-            'eCPRI_leased_line_capex': (
-                self.discount_ownership_cost( # Cost of initial installationthe fixed part ru-du
-                    self.cost_optimized(
-                        'lease_line_installation',
-                        speed = FH_tput * self.simulation_parameters['sectorization']
-                    )['price'] +  
-                    self.cost_optimized( # Cost of initial installationthe variable part by meter distance ru-du
-                        'lease_line_installation_per_meter',
-                        speed = FH_tput * self.simulation_parameters['sectorization']
-                    )['price'] * rudu_distance
-                    , 1) * 
-                sites_per_km2
-            ),
-            'eCPRI_leased_line_opex': (  # Rental cost for the ru-du leased line
-                self.discount_ownership_cost(
-                    self.cost_optimized(
-                        'lease_line_rental',
-                        speed = FH_tput * self.simulation_parameters['sectorization']
-                    )['price'], 0) *
-                sites_per_km2
-            ),
-            'f1u_leased_line_capex': (
-                self.discount_ownership_cost( # Cost of initial installationthe fixed part cu_up-du 
-                    self.cost_optimized(
-                        'lease_line_installation',
-                        speed = capacity_gbps * self.simulation_parameters['sectorization'] 
-                                * self.simulation_parameters['ru_du_ratio']
-                                * (1 - self.simulation_parameters['signaling_overhead'])
-                    )['price'] +  
-                    self.cost_optimized( # Cost of initial installationthe variable part by meter distance cu_up-du
-                        'lease_line_installation_per_meter',
-                        speed = capacity_gbps * self.simulation_parameters['sectorization']
-                                * self.simulation_parameters['ru_du_ratio']
-                                * (1 - self.simulation_parameters['signaling_overhead'])
-                    )['price'] * ducu_distance
-                    , 1) * 
-                sites_per_du
-            ),
-            'f1u_leased_line_opex': (  # Rental cost for the cu_up-du leased line
-                self.discount_ownership_cost(
-                    self.cost_optimized(
-                        'lease_line_rental',
-                        speed = capacity_gbps * self.simulation_parameters['sectorization']
-                                * self.simulation_parameters['ru_du_ratio']
-                                * (1 - self.simulation_parameters['signaling_overhead'])
-                    )['price'], 0) *
-                sites_per_du
-            ),
-            'f1c_leased_line_capex': (
-                self.discount_ownership_cost( # Cost of initial installationthe fixed part cu_cp-du
-                    self.cost_optimized(
-                        'lease_line_installation',
-                        speed = capacity_gbps * self.simulation_parameters['sectorization']
-                                * self.simulation_parameters['ru_du_ratio']
-                                * self.simulation_parameters['signaling_overhead']
-                    )['price'] +  
-                    self.cost_optimized( # Cost of initial installationthe variable part by meter distance cu_cp-du
-                        'lease_line_installation_per_meter',
-                        speed = capacity_gbps * self.simulation_parameters['sectorization']
-                                * self.simulation_parameters['ru_du_ratio']
-                                * self.simulation_parameters['signaling_overhead']
-                    )['price'] * ducu_distance
-                    , 1) * 
-                sites_per_du
-            ),
-            'f1c_leased_line_opex': (  # Rental cost for the cu_cp-du leased line
-                self.discount_ownership_cost(
-                    self.cost_optimized(
-                        'lease_line_rental',
-                        speed = capacity_gbps * self.simulation_parameters['sectorization']
-                                * self.simulation_parameters['ru_du_ratio']
-                                * self.simulation_parameters['signaling_overhead']
-                    )['price'], 0) *
-                sites_per_du
-            ),
-            'l1_controller': (  # cost for the L1 PCIe card Controller 
-                self.discount_ownership_cost(
-                    self.cost_optimized(
-                        'l1_controller' 
-                    )['price'], 1) *
-                sites_per_km2 / 
-                self.cost_optimized('l1_controller' )['ports']
-            ),
-            'cucp_cpu': ( #cost for the CU-CP CPU per km2
-                self.discount_ownership_cost(
-                    self.serv_cost(CUCP_utils)["cpu_price"], 1) *
-                self.simulation_parameters['sectorization'] *
-                sites_per_km2 
-            ),
-            'cucp_server': ( #cost for the CU-CP CPU per km2
-                self.discount_ownership_cost(
-                    self.serv_cost(CUCP_utils)["server_price"], 1) *
-                self.simulation_parameters['sectorization'] *
-                sites_per_km2 
-            ),
-            'cuup_cpu': ( #cost for the CU-UP CPU per km2
-                self.discount_ownership_cost(
-                    self.serv_cost(CUUP_utils)["cpu_price"], 1) *
-                self.simulation_parameters['sectorization'] *
-                sites_per_km2 
-            ),
-            'cuup_server': ( #cost for the CU-UP CPU per km2
-                self.discount_ownership_cost(
-                    self.serv_cost(CUUP_utils)["server_price"], 1) *
-                self.simulation_parameters['sectorization'] *
-                sites_per_km2 
-            ),
-            'du_cpu': ( #cost for the DU CPU per km2
-                self.discount_ownership_cost(
-                    self.serv_cost(DU_utils)["cpu_price"], 1) *
-                self.simulation_parameters['sectorization'] *
-                sites_per_km2 
-            ),
-            'du_server': ( #cost for the DU CPU per km2
-                self.discount_ownership_cost(
-                    self.serv_cost(DU_utils)["server_price"], 1) *
-                self.simulation_parameters['sectorization'] *
-                sites_per_km2 
-            ),
 
+        cucp_plan, cuup_plan, du_plan = plans
+
+        fh_speed = FH_tput * sectorization
+        f1u_speed = capacity_gbps * sectorization * ru_du_ratio * (1 - signaling_overhead)
+        f1c_speed = capacity_gbps * sectorization * ru_du_ratio * signaling_overhead
+
+        cost_breakdown = {
+            'single_sector_antenna': discount(price('single_sector_antenna'), 1) * sectorization * sites_per_km2,
+            'ru': discount(price('ru'), 1) * sectorization * sites_per_km2,
+            'tower': price('tower') * sites_per_km2,
+            'transportation': price('transportation') * sites_per_km2,
+            'installation': price('installation') * sites_per_km2,
+            'site_rental': discount(price('site_rental'), 0) * sites_per_km2,
+            'power_generator_battery_system': discount(price('power_generator_battery_system'), 1) * sites_per_km2,
+            'fiber_switch': discount(price('switch', ports = sectorization + 1, speed = capacity_gbps * sectorization), 1) * sites_per_km2,
+            'sfp_ru': discount(price('sfp', distance = rudu_distance, speed = capacity_gbps * sectorization), 1) * 2 * sites_per_km2,
+            'sfp_sectors': discount(price('sfp', distance = 100, speed = capacity_gbps), 1) * sectorization * sites_per_km2,
+            'eCPRI_leased_line_capex': discount(
+                price('lease_line_installation', speed = fh_speed) +
+                price('lease_line_installation_per_meter', speed = fh_speed) * rudu_distance, 1) * sites_per_km2,
+            'eCPRI_leased_line_opex': discount(price('lease_line_rental', speed = fh_speed), 0) * sites_per_km2,
+            'f1u_leased_line_capex': discount(
+                price('lease_line_installation', speed = f1u_speed) +
+                price('lease_line_installation_per_meter', speed = f1u_speed) * ducu_distance, 1) * sites_per_du,
+            'f1u_leased_line_opex': discount(price('lease_line_rental', speed = f1u_speed), 0) * sites_per_du,
+            'f1c_leased_line_capex': discount(
+                price('lease_line_installation', speed = f1c_speed) +
+                price('lease_line_installation_per_meter', speed = f1c_speed) * ducu_distance, 1) * sites_per_du,
+            'f1c_leased_line_opex': discount(price('lease_line_rental', speed = f1c_speed), 0) * sites_per_du,
+            'l1_controller': discount(price('l1_controller'), 1) * sites_per_km2 / price('l1_controller', key='ports'),
+            'cucp_cpu': discount(cucp_plan["cpu_price"], 1) * sectorization * sites_per_km2,
+            'cucp_server': discount(cucp_plan["server_price"], 1) * sectorization * sites_per_km2,
+            'cuup_cpu': discount(cuup_plan["cpu_price"], 1) * sectorization * sites_per_km2,
+            'cuup_server': discount(cuup_plan["server_price"], 1) * sectorization * sites_per_km2,
+            'du_cpu': discount(du_plan["cpu_price"], 1) * sectorization * sites_per_km2,
+            'du_server': discount(du_plan["server_price"], 1) * sectorization * sites_per_km2,
         }
 
-        site_count = self.simulation_parameters['ru_du_ratio'] * self.simulation_parameters['du_cuup_ratio']/self.simulation_parameters['sectorization']
+        site_count = ru_du_ratio * self.simulation_parameters['du_cuup_ratio']/sectorization
 
         components_breakdown = {
-            'single_sector_antenna': site_count * self.simulation_parameters['sectorization'],
-            'ru': site_count * self.simulation_parameters['sectorization'],
-            'tower': site_count,  
+            'single_sector_antenna': site_count * sectorization,
+            'ru': site_count * sectorization,
+            'tower': site_count,
             'power_generator_battery_system': site_count,
             'fiber_switch': site_count,
-            'sfp': site_count * self.simulation_parameters['sectorization'] * 2,
-            'eCPRI_Throughput(Gbps)': FH_tput * self.simulation_parameters['sectorization'],
-            'f1u_Throughput(Gbps)': capacity_gbps * self.simulation_parameters['sectorization'] 
-                                * self.simulation_parameters['ru_du_ratio']
-                                * (1 - self.simulation_parameters['signaling_overhead']),
-            'f1c_Throughput(Gbps)': capacity_gbps * self.simulation_parameters['sectorization']
-                                * self.simulation_parameters['ru_du_ratio']
-                                * self.simulation_parameters['signaling_overhead'],
-            'l1_controller': site_count * self.simulation_parameters['sectorization']/4,
-            'cucp_cpu': self.serv_cost(CUCP_utils)["number_of_cpus"] 
-                        * self.simulation_parameters['sectorization'] 
-                        * site_count,
-            'cucp_server': self.serv_cost(CUCP_utils)["number_of_servers"]
-                * self.simulation_parameters['sectorization']
-                * site_count, 
-            'cuup_cpu': self.serv_cost(CUUP_utils)["number_of_cpus"] 
-                        * self.simulation_parameters['sectorization'] 
-                        * site_count,
-            'cuup_server': self.serv_cost(CUUP_utils)["number_of_servers"]
-                * self.simulation_parameters['sectorization']
-                * site_count, 
-            'du_cpu': self.serv_cost(DU_utils)["number_of_cpus"] 
-                        * self.simulation_parameters['sectorization'] 
-                        * site_count,
-            'du_server': self.serv_cost(DU_utils)["number_of_servers"]
-                * self.simulation_parameters['sectorization']
-                * site_count, 
+            'sfp': site_count * sectorization * 2,
+            'eCPRI_Throughput(Gbps)': fh_speed,
+            'f1u_Throughput(Gbps)': f1u_speed,
+            'f1c_Throughput(Gbps)': f1c_speed,
+            'l1_controller': site_count * sectorization/4,
+            'cucp_cpu': cucp_plan["number_of_cpus"] * sectorization * site_count,
+            'cucp_server': cucp_plan["number_of_servers"] * sectorization * site_count,
+            'cuup_cpu': cuup_plan["number_of_cpus"] * sectorization * site_count,
+            'cuup_server': cuup_plan["number_of_servers"] * sectorization * site_count,
+            'du_cpu': du_plan["number_of_cpus"] * sectorization * site_count,
+            'du_server': du_plan["number_of_servers"] * sectorization * site_count,
         }
 
+        return cost_breakdown, components_breakdown
 
-        return {"cost_breakdown": cost_breakdown, "components_breakdown": components_breakdown}
+    def serv_cost_batch(self, cpu_util, max_utilization = 80):
+        """
+
+        Array version of serv_cost.
+
+        Parameters
+        ----------
+        cpu_util : array_like
+            percentages of overall CPU Cores for a sector.
+
+        Returns
+        -------
+        server cost breakdown : dict of arrays
+            "cpu_price", "server_price", "number_of_cpus" and
+            "number_of_servers" for each utilization.
+
+        """
+        cpu = self.cost_parameters['cpu'][0]
+        server = self.cost_parameters['server'][0]
+
+        max_utilization = max_utilization - overhead_per_server(self.simulation_parameters['type_of_server'],self.simulation_parameters['type_of_virtualization'],self.simulation_parameters['prop_or_not'],self.simulation_parameters['n_virtual_machines'])
+
+        number_of_cores = np.asarray(cpu_util, dtype=float) / max_utilization
+        number_of_cpus = number_of_cores / cpu['cores']
+        cpu_price = number_of_cpus * cpu['price']
+
+        number_of_servers = number_of_cpus / server['cpu_max']
+        server_price = number_of_servers * server['price']
+
+        return {"cpu_price": cpu_price, 
+                "server_price": server_price, 
+                "number_of_cpus": number_of_cpus,
+                "number_of_servers": number_of_servers}
+
+    def get_cost_batch(self, sites_per_km2, capacity_gbps, rudu_distance, ducu_distance, CUCP_utils, CUUP_utils, DU_utils):
+        """
+
+        Array version of get_cost.
+
+        All arguments are broadcast against each other, and catalog
+        selection and discounting are done for all evaluations at once.
 
+        Parameters
+        ----------
+        sites_per_km2, capacity_gbps, rudu_distance, ducu_distance : array_like
+            as for get_cost, one value per evaluation.
+
+        CUCP_utils, CUUP_utils, DU_utils : array_like
+            as for get_cost, one value per evaluation.
+
+        Returns
+        -------
+        costs : pandas.DataFrame
+            one row per evaluation, with ("cost_breakdown", item) and
+            ("components_breakdown", item) columns holding the values
+            get_cost returns.
+
+        """
+        (sites_per_km2, capacity_gbps, rudu_distance, ducu_distance,
+         CUCP_utils, CUUP_utils, DU_utils) = [
+            np.array(values, dtype=float).ravel() for values in np.broadcast_arrays(
+                sites_per_km2, capacity_gbps, rudu_distance, ducu_distance,
+                CUCP_utils, CUUP_utils, DU_utils)
+        ]
+        n = len(sites_per_km2)
+
+        price = partial(self._cost_optimized_batch, n=n)
+        plans = [self.serv_cost_batch(utils) for utils in (CUCP_utils, CUUP_utils, DU_utils)]
+
+        cost_breakdown, components_breakdown = self._breakdowns(
+            price, self.discount_ownership_costs, plans,
+            sites_per_km2, capacity_gbps, rudu_distance, ducu_distance)
+
+        columns = {}
+        for breakdown, values in (("cost_breakdown", cost_breakdown), ("components_breakdown", components_breakdown)):
+            for key, value in values.items():
+                columns[(breakdown, key)] = np.broadcast_to(value, (n,))
+
+        return pd.DataFrame(columns)
 
 
+@lru_cache(maxsize=None)
+def annuity_factor(asset_lifetime, discount_rate) -> float:
+    """
+    Present value of one unit of cost paid at the start of each year.
+
+    Parameters
+    ----------
+    asset_lifetime : int
+        number of years.
+    discount_rate : float
+        yearly discount rate as a fraction.
+
+    Returns
+    -------
+        factor : float
+            sum of 1 / (1 + discount_rate) ** i for i in range(asset_lifetime)
+
+    """
+    if asset_lifetime <= 0:
+        return 0.0
+    if discount_rate == 0:
+        return float(asset_lifetime)
+
+    discount = 1 / (1 + discount_rate)
+    return (1 - discount ** asset_lifetime) / (1 - discount)
+
+
+class ComponentCatalog(object):
+    """
+
+    Price sorted index over the items of one cost component.
+
+    Item attributes are kept in NumPy arrays in price order, so the
+    cheapest item meeting all minimums is the first True entry of a
+    vectorized mask. Answers are memoized per query.
+
+    Parameters
+    ----------
+    items : list of dicts
+        Items of a component in cost_parameters.
+    maxsize : int
+        Maximum number of memoized queries.
+    min_vectorized : int
+        Catalogs with fewer items are scanned in Python, which is faster
+        than masking for a handful of items.
+
+    """
+
+    def __init__(self, items, maxsize=1024, min_vectorized=16) -> None:
+
+        self.items = items
+        self.maxsize = maxsize
+        self.min_vectorized = min_vectorized
+        self._attributes = {}
+        self._queries = OrderedDict()
+
+        prices = self._values('price')
+        if prices is None:
+            self.order = None
+        else:
+            # stable, so equal prices keep the listed order
+            self.order = np.argsort(prices, kind='stable')
+
+    def __len__(self):
+        return len(self.items)
+
+    def _values(self, key):
+        values = []
+        for item in self.items:
+            value = item.get(key)
+            if isinstance(value, bool) or not isinstance(value, (int, float, np.number)):
+                return None
+            values.append(value)
+
+        return np.array(values, dtype=float)
+
+    def _attribute(self, key):
+        """
+
+        Values of an attribute in price order, or None if any item lacks
+        a numeric value for it.
+
+        """
+        if key not in self._attributes:
+            values = self._values(key)
+            if values is not None:
+                values = values[self.order]
+            self._attributes[key] = values
+
+        return self._attributes[key]
+
+    def select(self, **kwargs):
+        """
+
+        Cheapest item meeting all minimums, as `Cost.cost_optimized`.
+
+        Small catalogs and catalogs with missing or non-numeric attributes
+        are scanned item by item instead of masked.
+
+        Returns
+        -------
+        item : dict
+            The selected item.
+
+        """
+        return self.items[self.index(**kwargs)]
+
+    def index(self, **kwargs):
+        """
+
+        Position in the items of the item `select` returns.
+
+        """
+        key = tuple(sorted(kwargs.items()))
+        try:
+            idx = self._queries.get(key)
+        except TypeError:
+            return self._scan_index(**kwargs)
+
+        if idx is None:
+            if len(self.items) >= self.min_vectorized and self.order is not None:
+                idx = self._select_index(**kwargs)
+            if idx is None:
+                idx = self._scan_index(**kwargs)
+
+            self._queries[key] = idx
+            if len(self._queries) > self.maxsize:
+                self._queries.popitem(last=False)
+        else:
+            self._queries.move_to_end(key)
+
+        return idx
+
+    def indices(self, **kwargs):
+        """
+
+        Array version of `index` for arrays of minimums.
+
+        Parameters
+        ----------
+        kwargs : array_like
+            Minimum values of each attribute, one per query.
+
+        Returns
+        -------
+        indices : numpy.ndarray
+            Position of the selected item for each query.
+
+        """
+        keys = list(kwargs)
+        queries = np.column_stack([
+            np.asarray(kwargs[key], dtype=float).ravel() for key in keys
+        ])
+
+        attributes = [self._attribute(key) for key in keys] if self.order is not None else [None]
+        if any(values is None for values in attributes):
+            # answer each distinct query once through the scan
+            unique, inverse = np.unique(queries, axis=0, return_inverse=True)
+            selected = np.array([
+                self.index(**dict(zip(keys, query))) for query in unique
+            ], dtype=int)
+            return selected[inverse.reshape(-1)]
+
+        selected = np.empty(len(queries), dtype=int)
+
+        # bound the (queries x items) masks to about 10 million entries
+        chunk = max(1, 10 ** 7 // len(self.items))
+        for start in range(0, len(queries), chunk):
+            query = queries[start:start + chunk]
+            mask = np.ones((len(query), len(self.items)), dtype=bool)
+            for column, values in enumerate(attributes):
+                mask &= ~(values[np.newaxis, :] < query[:, column, np.newaxis])
+
+            first = mask.argmax(axis=1)
+            found = mask[np.arange(len(query)), first]
+            selected[start:start + chunk] = np.where(
+                found, self.order[first], len(self.items) - 1)
+
+        return selected
+
+    def column(self, key):
+        """
+
+        Values of an attribute in the listed order of the items.
+
+        """
+        return np.array([item[key] for item in self.items], dtype=float)
+
+    def _select_index(self, **kwargs):
+        selected = np.ones(len(self.items), dtype=bool)
+
+        for key, value in kwargs.items():
+            values = self._attribute(key)
+            if values is None or not isinstance(value, (int, float, np.number)):
+                return None
+            # an item is only rejected when it is below the minimum
+            selected &= ~(values < value)
+
+        matches = np.flatnonzero(selected)
+        if not len(matches):
+            return len(self.items) - 1
+
+        return int(self.order[matches[0]])
+
+    def _scan_index(self, **kwargs):
+        selected_idx = -1
+        for idx , val in enumerate(self.items):
+            selected = True
+            for key, value in kwargs.items():
+                if val[key] < value:
+                    selected = False
+                    break
+            if selected:
+                if selected_idx == -1: 
+                    selected_idx = idx
+                else: 
+                    if val['price'] < self.items[selected_idx]['price']:
+                        selected_idx = idx
 
+        if selected_idx == -1:
+            return len(self.items) - 1
 
+        return selected_idx
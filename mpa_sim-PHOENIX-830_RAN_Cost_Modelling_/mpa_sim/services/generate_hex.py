@@ -7,18 +7,47 @@ See the git repo for futher details: https://github.com/urschrei/hexcover
 
 """
 import os
+import copy
+import pickle
+import hashlib
 import configparser
 import math
 import fiona
 from shapely.ops import transform
 from shapely.geometry import Point, mapping, shape, Polygon
-from functools import partial
+from functools import lru_cache
 from rtree import index
 import pyproj
+import numpy as np
 
 from collections import OrderedDict
 
 
+@lru_cache(maxsize=32)
+def get_transformer(original_crs, new_crs):
+    """
+
+    Return a cached transformer between two Coordinate Reference Systems.
+
+    Axis order follows each CRS definition (latitude first for epsg:4326),
+    as the `pyproj.transform` call this replaces did.
+
+    Parameters
+    ----------
+    original_crs : string
+        Original Coordinate Reference System.
+    new_crs : string
+        New Coordinate Reference System.
+
+    Returns
+    -------
+    transformer : pyproj.Transformer
+        Transformer from `original_crs` to `new_crs`.
+
+    """
+    return pyproj.Transformer.from_crs(original_crs, new_crs)
+
+
 def convert_point_to_projected_crs(point, original_crs, new_crs):
     """
 
@@ -39,13 +68,8 @@ def convert_point_to_projected_crs(point, original_crs, new_crs):
         Geojson point in desired Coordinate Reference System.
 
     """
-    project = partial(
-        pyproj.transform,
-        pyproj.Proj(original_crs),
-        pyproj.Proj(new_crs)
-    )
-
-    new_geom = transform(project, Point(point))
+    new_geom = transform(get_transformer(original_crs, new_crs).transform,
+        Point(point))
 
     output = {
         'type': 'Feature',
@@ -56,6 +80,35 @@ def convert_point_to_projected_crs(point, original_crs, new_crs):
     return output
 
 
+def convert_points_to_projected_crs(points, original_crs, new_crs):
+    """
+
+    Convert an array of points to projected coordinates in one call.
+
+    Parameters
+    ----------
+    points : array_like
+        (N, 2) array of point coordinates, in the axis order of
+        `original_crs` as for `convert_point_to_projected_crs`.
+    original_crs : string
+        Original Coordinate Reference System.
+    new_crs : string
+        New Coordinate Reference System.
+
+    Returns
+    -------
+    output : numpy.ndarray
+        (N, 2) array of coordinates in desired Coordinate Reference System.
+
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+
+    x, y = get_transformer(original_crs, new_crs).transform(
+        points[:, 0], points[:, 1])
+
+    return np.column_stack((x, y))
+
+
 def calculate_polygons(startx, starty, endx, endy, radius):
     """
 
@@ -317,8 +370,133 @@ def generate_site_areas(point, site_radius):
     return site_area, interfering_site_areas
 
 
+class GeometryCache(object):
+    """
+
+    Least recently used cache of site geometry, keyed by site radius and
+    projected origin.
+
+    Each entry holds the transmitter, interfering transmitters, site area
+    and interfering site areas produced for that layout, so repeated
+    scenarios skip the hexagon grid and spatial index entirely.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of layouts kept in memory.
+    cache_dir : string
+        Optional directory where layouts are also pickled, so they are
+        shared between processes and runs.
+
+    """
+    def __init__(self, maxsize=128, cache_dir=None):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self._layouts = OrderedDict()
+
+
+    def __len__(self):
+        return len(self._layouts)
+
+
+    def clear(self):
+        """
+
+        Remove all layouts held in memory.
+
+        """
+        self._layouts.clear()
+
+
+    def _path(self, key):
+        name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, 'site_areas_{}.pkl'.format(name))
+
+
+    def _load(self, key):
+        if self.cache_dir is None:
+            return None
+
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'rb') as source:
+            return pickle.load(source)
+
+
+    def _store(self, key, layout):
+        if self.cache_dir is None:
+            return
+
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        # write then rename, so other processes never read a partial file
+        path = self._path(key)
+        temp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temp_path, 'wb') as sink:
+            pickle.dump(layout, sink, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+
+    def sites_and_site_areas(self, point, site_radius):
+        """
+
+        Return the site layout around a projected point, generating it on
+        first use.
+
+        Parameters
+        ----------
+        point : dict
+            Geojson point in desired Coordinate Reference System.
+        site_radius : int
+            Distance between transmitter and site edge in meters.
+
+        Returns
+        -------
+        transmitter : List of dicts
+            Contains a geojson dict for the transmitter site.
+        interfering_transmitters : List of dicts
+            Contains multiple geojson dicts for the interfering transmitter
+            sites.
+        site_area : List of dicts
+            Contains a geojson dict for the transmitter site area.
+        interfering_site_areas : List of dicts
+            Contains multiple geojson dicts for the interfering transmitter
+            site areas.
+
+        """
+        x, y = point['geometry']['coordinates'][:2]
+        key = (site_radius, float(x), float(y))
+
+        layout = self._layouts.get(key)
+        if layout is not None:
+            self._layouts.move_to_end(key)
+        else:
+            layout = self._load(key)
+            if layout is None:
+                site_area, interfering_site_areas = generate_site_areas(
+                    point, site_radius)
+                transmitter, interfering_transmitters = find_site_locations(
+                    site_area, interfering_site_areas)
+                layout = (transmitter, interfering_transmitters, site_area,
+                    interfering_site_areas)
+                self._store(key, layout)
+
+            self._layouts[key] = layout
+            if len(self._layouts) > self.maxsize:
+                self._layouts.popitem(last=False)
+
+        # callers get their own copy, so the cached layout stays untouched
+        return copy.deepcopy(layout)
+
+
+geometry_cache = GeometryCache()
+
+
 def produce_sites_and_site_areas(unprojected_point, site_radius, unprojected_crs,
-                                 projected_crs):
+                                 projected_crs, cache=None):
     """
 
     Meta function to produce a set of hex shapes with a specific site_radius.
@@ -329,6 +507,9 @@ def produce_sites_and_site_areas(unprojected_point, site_radius, unprojected_crs
         x and y coordinates for an unprojected point.
     site_radius : int
         Distance between transmitter and site edge in meters.
+    cache : GeometryCache
+        Cache the layout is looked up in, the module `geometry_cache` by
+        default.
 
     Returns
     -------
@@ -347,10 +528,7 @@ def produce_sites_and_site_areas(unprojected_point, site_radius, unprojected_crs
                                            projected_crs
                                            )
 
-    site_area, interfering_site_areas = generate_site_areas(point, site_radius)
-
-    transmitter, interfering_transmitters = find_site_locations(site_area,
-                                                                interfering_site_areas
-                                                                )
+    if cache is None:
+        cache = geometry_cache
 
-    return transmitter, interfering_transmitters, site_area, interfering_site_areas
+    return cache.sites_and_site_areas(point, site_radius)
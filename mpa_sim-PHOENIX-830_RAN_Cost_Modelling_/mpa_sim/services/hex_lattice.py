@@ -0,0 +1,242 @@
+"""
+
+Closed form site areas on the regular hexagon lattice of `calculate_polygons`.
+
+`generate_site_areas` builds every hexagon covering a buffer around the
+point and searches them with an rtree. The hexagons form a regular
+"pointy top" lattice with every other row shifted by half a hexagon, so the
+serving hexagon follows from rounding the point to axial hex coordinates
+and each tier of interferers is a ring of hexagons around it.
+
+"""
+import math
+
+from shapely.geometry import shape, Point
+
+
+# axial (q, r) steps to the six neighbours, in ring walking order
+DIRECTIONS = [(1, 0), (1, -1), (0, -1), (-1, 0), (-1, 1), (0, 1)]
+
+
+class HexLattice(object):
+    """
+
+    The hexagon lattice `generate_site_areas` lays out around a point.
+
+    Rows and columns follow the order in which `calculate_polygons` emits
+    hexagons, for a buffer of `2 * site_radius * tiers` around the point,
+    so site ids match those of `generate_site_areas` for one tier.
+
+    Parameters
+    ----------
+    x, y : float
+        Projected coordinates of the point.
+    site_radius : int
+        Distance between transmitter and site edge in meters.
+    tiers : int
+        Number of rings of interfering site areas.
+
+    """
+    def __init__(self, x, y, site_radius, tiers=1):
+        if tiers < 1:
+            raise ValueError('tiers must be at least 1: {}'.format(tiers))
+
+        # hexagon dimensions as in calculate_polygons
+        self.side_length = (2 * site_radius) * math.tan(math.pi / 6)
+        self.half_width = self.side_length * math.cos(math.radians(30))
+        self.width = self.half_width * 2
+        self.height = 2 * self.side_length
+        self.row_height = 1.5 * self.side_length
+
+        buffer = site_radius * 2 * tiers
+        self.origin_x = x - buffer - self.width
+        self.origin_y = y - buffer - self.height
+        end_x = x + buffer + self.width
+
+        # hexagons per unshifted and shifted row
+        self.row_lengths = (
+            int(math.ceil((end_x - self.origin_x) / self.width)),
+            int(math.ceil((end_x - self.origin_x - self.half_width) /
+                self.width)),
+        )
+
+
+    def centre(self, row, column):
+        """
+
+        Centre of the hexagon in a row and column.
+
+        """
+        x = (self.origin_x + column * self.width +
+            (row % 2 + 1) * self.half_width)
+        y = self.origin_y + row * self.row_height + self.side_length
+
+        return x, y
+
+
+    def locate(self, x, y):
+        """
+
+        Row and column of the hexagon containing a point.
+
+        """
+        x = (x - self.origin_x - self.half_width) / self.side_length
+        y = (y - self.origin_y - self.side_length) / self.side_length
+
+        q = math.sqrt(3) / 3 * x - y / 3
+        r = 2 / 3 * y
+
+        # round the cube coordinates (q, r, -q - r), fixing the component
+        # with the largest rounding error
+        s = -q - r
+        rq, rr, rs = round(q), round(r), round(s)
+        dq, dr, ds = abs(rq - q), abs(rr - r), abs(rs - s)
+        if dq > dr and dq > ds:
+            rq = -rr - rs
+        elif dr > ds:
+            rr = -rq - rs
+
+        return self.offset(rq, rr)
+
+
+    def serving(self, x, y):
+        """
+
+        Row and column of the hexagon whose centre is closest to a point.
+
+        The lattice is laid out from the point itself, which puts the point
+        on the edge shared by two hexagons. The hexagon with the lowest site
+        id is taken on such ties, where the rtree search of
+        `find_closest_site_areas` returns either one.
+
+        """
+        row, column = self.locate(x, y)
+        cells = [(row, column)] + self.ring(row, column, 1)
+
+        distances = []
+        for cell in cells:
+            centre_x, centre_y = self.centre(*cell)
+            distances.append(math.hypot(centre_x - x, centre_y - y))
+
+        closest = min(distances)
+        tolerance = 1e-9 * self.side_length
+
+        return min(
+            (cell for cell, distance in zip(cells, distances)
+                if distance - closest <= tolerance),
+            key=lambda cell: self.site_id(*cell)
+        )
+
+
+    def axial(self, row, column):
+        return column - (row - (row & 1)) // 2, row
+
+
+    def offset(self, q, r):
+        return r, q + (r - (r & 1)) // 2
+
+
+    def ring(self, row, column, radius):
+        """
+
+        Rows and columns of the hexagons at `radius` steps from a hexagon.
+
+        """
+        q, r = self.axial(row, column)
+        q += DIRECTIONS[4][0] * radius
+        r += DIRECTIONS[4][1] * radius
+
+        cells = []
+        for dq, dr in DIRECTIONS:
+            for _ in range(radius):
+                cells.append(self.offset(q, r))
+                q += dq
+                r += dr
+
+        return cells
+
+
+    def site_id(self, row, column):
+        """
+
+        Position of a hexagon in the order `calculate_polygons` emits them.
+
+        """
+        unshifted, shifted = self.row_lengths
+        return ((row + 1) // 2) * unshifted + (row // 2) * shifted + column
+
+
+    def site_area(self, row, column):
+        """
+
+        Geojson site area for a hexagon, with the vertex order of
+        `calculate_polygons`.
+
+        """
+        x, y = self.centre(row, column)
+        startx = x - self.half_width
+        starty = y - self.side_length
+        p = self.side_length * 0.5
+
+        poly = [
+            (startx, starty + p),
+            (startx, starty + (3 * p)),
+            (startx + self.half_width, starty + self.height),
+            (startx + self.width, starty + (3 * p)),
+            (startx + self.width, starty + p),
+            (startx + self.half_width, starty),
+            (startx, starty + p),
+        ]
+
+        return {
+            'type': 'Feature',
+            'geometry': {
+                'type': 'Polygon',
+                'coordinates': [poly],
+            },
+            'centroid': Point(x, y),
+            'properties': {
+                'site_id': self.site_id(row, column)
+            }
+        }
+
+
+def generate_lattice_site_areas(point, site_radius, tiers=1):
+    """
+
+    Closed form equivalent of `generate_site_areas`.
+
+    The work only depends on the number of tiers, not on the size of the
+    buffered area.
+
+    Parameters
+    ----------
+    point : dict
+        Geojson point in desired Coordinate Reference System.
+    site_radius : int
+        Distance between transmitter and site edge in meters.
+    tiers : int
+        Number of rings of interfering site areas, each ring `i` holding
+        `6 * i` site areas.
+
+    Returns
+    -------
+    site_area : List of dicts
+        Contains the geojson site area for the transmitter.
+    interfering_site_areas : List of dicts
+        Contains the geojson interfering site areas, ordered by tier.
+
+    """
+    geom_shape = shape(point['geometry'])
+    lattice = HexLattice(geom_shape.x, geom_shape.y, site_radius, tiers)
+
+    row, column = lattice.serving(geom_shape.x, geom_shape.y)
+
+    site_area = [lattice.site_area(row, column)]
+
+    interfering_site_areas = []
+    for radius in range(1, tiers + 1):
+        for cell in lattice.ring(row, column, radius):
+            interfering_site_areas.append(lattice.site_area(*cell))
+
+    return site_area, interfering_site_areas
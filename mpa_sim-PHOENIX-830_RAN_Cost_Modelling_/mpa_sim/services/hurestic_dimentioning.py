@@ -1,6 +1,70 @@
+import os
+import json
+import hashlib
+import logging
+import joblib
 import pandas as pd
 import math
-from sklearn.cluster import KMeans
+import numpy as np
+from scipy.stats import binom
+import sklearn
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+log = logging.getLogger(__name__)
+
+
+# cell tower columns used by the dimensioning, with compact dtypes
+CELL_DTYPES = {
+    "MCC": np.int16,
+    "MNC": np.int16,
+    "LAC": np.int32,
+    "CID": np.int64,
+    "range": np.int32,
+    "samples": np.int32,
+}
+
+CELL_COLUMNS = ["MNC", "LAC", "CID", "range", "samples"]
+
+# number of cells from which the clustering is fitted in mini batches, and
+# the MiniBatchKMeans settings
+MINIBATCH_MIN_SAMPLES = 100000
+MINIBATCH_BATCH_SIZE = 4096
+MINIBATCH_N_INIT = 3
+
+
+def _write_cache(path, write):
+    """
+        Write a cache file through write(temporary_path), replacing path only
+        once the file is complete so other runs never read a partial file
+
+        A failed write, e.g. to a read-only directory, is logged and the
+        temporary file removed, as the cache is only an optimization
+
+        Returns:
+            Whether the cache file was written
+    """
+
+    temporary_path = "{}.{}.tmp".format(path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        write(temporary_path)
+        os.replace(temporary_path, path)
+    except OSError as error:
+        log.warning("Could not write cache file %s: %s", path, error)
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        return False
+
+    return True
+
+
 # import scipy  
 # import seaborn as sns;sns.set(style="white")
 
@@ -31,6 +95,163 @@ class Hurestic_Dimensioning:
                            "Nrb":[160, 24, 11],
                            "r_x":[100, 15, 7]})
 
+        # transit_df columns as arrays indexed by mu
+        mu = self.transit_df["mu"].to_numpy()
+        self.numerology = {}
+        for column in self.transit_df.columns:
+            values = np.zeros(mu.max() + 1, dtype=self.transit_df[column].dtype)
+            values[mu] = self.transit_df[column].to_numpy()
+            self.numerology[column] = values
+
+        # maximum transmission rate of every mu, per overhead value
+        self._transmission_rates = {}
+
+    def _cache_path(self, suffix, cache_dir=None):
+
+        """
+            Path of a cache file derived from the csv, next to the csv unless
+            a cache_dir is given
+        """
+
+        folder, name = os.path.split(self.path_to_csv)
+        name = os.path.splitext(name)[0] + suffix
+
+        return os.path.join(folder if cache_dir is None else cache_dir, name)
+
+    def load_cells(self, mcc=None, mnc=None, chunksize=1000000, cache=True,
+        cache_dir=None):
+
+        """
+            Read the cell tower csv, keeping the columns used by the dimensioning
+
+            The csv is parsed in chunks with compact dtypes, and only rows of
+            the given MCCs and MNCs are kept. With pyarrow installed the result
+            is saved as Parquet, next to the csv or in cache_dir, which later
+            runs read instead of parsing the csv again, as long as the csv and
+            filters are unchanged. Failing to read or write the Parquet file
+            falls back to the csv.
+
+            Args:
+                mcc (int or list): Mobile country codes to keep, all by default
+                mnc (int or list): Mobile network codes to keep, all by default
+                chunksize (int):   Number of csv rows parsed at once
+                cache (bool):      Whether to read and write the Parquet file
+                cache_dir (str):   Folder of the Parquet file, the csv folder by default
+
+            Returns:
+                Dataframe with the MNC, LAC, CID, range and samples columns
+        """
+
+        filters = {
+            "MCC": None if mcc is None else np.atleast_1d(mcc).tolist(),
+            "MNC": None if mnc is None else np.atleast_1d(mnc).tolist(),
+        }
+
+        stat = os.stat(self.path_to_csv)
+        source = json.dumps({
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "filters": filters,
+        }, sort_keys=True)
+
+        cache_path = self._cache_path(".cells.parquet", cache_dir)
+        cache = cache and pq is not None
+
+        if cache and os.path.exists(cache_path):
+            try:
+                metadata = pq.read_schema(cache_path).metadata or {}
+                if metadata.get(b"mpa_sim_source") == source.encode():
+                    return pd.read_parquet(cache_path, memory_map=True)
+            except Exception as error:
+                log.warning("Could not read cache file %s: %s", cache_path, error)
+
+        usecols = CELL_COLUMNS + (["MCC"] if filters["MCC"] is not None else [])
+
+        chunks = []
+        for chunk in pd.read_csv(self.path_to_csv, usecols=usecols,
+            dtype={column: CELL_DTYPES[column] for column in usecols},
+            chunksize=chunksize):
+
+            for column, values in filters.items():
+                if values is not None:
+                    chunk = chunk[chunk[column].isin(values)]
+
+            chunks.append(chunk[CELL_COLUMNS])
+
+        df = pd.concat(chunks, ignore_index=True)
+
+        if cache:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            table = table.replace_schema_metadata(dict(
+                table.schema.metadata or {}, mpa_sim_source=source))
+
+            _write_cache(cache_path, lambda path: pq.write_table(table, path))
+
+        return df
+
+    def cluster_cells(self, df, k=4, cache=True, cache_dir=None):
+
+        """
+            Cluster the cells by range and samples
+
+            The clustering is saved next to the csv, or in cache_dir, with a
+            fingerprint of the range and samples of the cells, the fit settings
+            and the sklearn version, so runs on the same data load it instead of
+            fitting it again. A saved clustering that cannot be loaded is fitted
+            again. Datasets of MINIBATCH_MIN_SAMPLES cells or more are fitted
+            with MiniBatchKMeans.
+
+            Args:
+                df (dataframe): Cells with range and samples columns
+                k (int):        Number of clusters
+                cache (bool):   Whether to read and write the saved clustering
+                cache_dir (str): Folder of the saved clustering, the csv folder by default
+
+            Returns:
+                kmeans_model    : Fitted clustering model
+                labels          : Cluster of every cell
+        """
+
+        X = df[['range', 'samples']]
+
+        fingerprint = hashlib.sha1()
+        for column in X.columns:
+            fingerprint.update(np.ascontiguousarray(X[column].to_numpy(dtype=np.float64)))
+        fingerprint.update(json.dumps({
+            "rows": len(X),
+            "k": k,
+            "sklearn": sklearn.__version__,
+            "minibatch_min_samples": MINIBATCH_MIN_SAMPLES,
+            "minibatch_batch_size": MINIBATCH_BATCH_SIZE,
+            "minibatch_n_init": MINIBATCH_N_INIT,
+        }, sort_keys=True).encode())
+        fingerprint = fingerprint.hexdigest()
+
+        cache_path = self._cache_path(".clusters.pkl", cache_dir)
+
+        if cache and os.path.exists(cache_path):
+            try:
+                saved = joblib.load(cache_path)
+                if saved["fingerprint"] == fingerprint:
+                    return saved["kmeans"], saved["labels"]
+            except Exception as error:
+                log.warning("Could not load cache file %s: %s", cache_path, error)
+
+        if len(X) >= MINIBATCH_MIN_SAMPLES:
+            kmeans = MiniBatchKMeans(n_clusters=k, random_state=0,
+                batch_size=MINIBATCH_BATCH_SIZE, n_init=MINIBATCH_N_INIT).fit(X)
+        else:
+            kmeans = KMeans(n_clusters=k, random_state=0).fit(X)
+
+        labels = kmeans.labels_.astype(np.int8)
+
+        if cache:
+            saved = {"fingerprint": fingerprint, "kmeans": kmeans, "labels": labels}
+            _write_cache(cache_path,
+                lambda path: joblib.dump(saved, path, compress=0))
+
+        return kmeans, labels
+
     def network_acquisition(self,df, a, b):
 
         """
@@ -46,36 +267,26 @@ class Hurestic_Dimensioning:
                 than the input range (a,b) from the top 3 MNC's
 
         """
-        
-        df1 = pd.DataFrame()
-        for mnc in df["MNC"].unique().tolist():
-            m = df[df["MNC"]==mnc]
-            
-
-            m = m[ (m["samples"]<b)  & (m["samples"]>a)]
-            
-            if m.shape[0]==0:
-                # print(f"For MNC: {mnc}, no data present in range ({a},{b})")
-                pass
-
-            else:
-                # find LAC id having max samples
-                hm_lac = m.groupby(["LAC"], as_index=False)["samples"].sum().sort_values("samples", ascending=False)["LAC"].values[0]
 
+        m = df[ (df["samples"]<b)  & (df["samples"]>a)]
 
-                data = m[m["LAC"]==hm_lac]
+        if m.shape[0]==0:
+            return(pd.DataFrame())
 
-                # print(data)
-                # print("MNC:",mnc)
-                # print("LAC:", hm_lac)
-                # print("CID:",data.loc[data["samples"].idxmax(), 'CID'])
+        # find LAC id having max samples per MNC, the lowest LAC id on ties
+        lac_samples = m.groupby(["MNC", "LAC"])["samples"].sum()
+        hm_lac = lac_samples.groupby(level="MNC").idxmax()
+        hm_lac = pd.Series([lac for _, lac in hm_lac], index=hm_lac.index)
 
-                # df1 = pd.concat([df1, data.sort_values("samples", ascending = False)]).reset_index(drop=True)
-                df1 = pd.concat([df1, data.sort_values("samples", ascending = False)])
+        df1 = m[m["LAC"] == m["MNC"].map(hm_lac)]
 
-                # print("CID's:", data.sort_values("CID", ascending = False) )
+        # MNCs in the order they appear in the data, each sorted by samples
+        mnc_order = pd.Series(np.arange(df["MNC"].nunique(dropna=False)),
+            index=df["MNC"].unique())
+        order = np.lexsort((-df1["samples"].to_numpy(dtype=float),
+            df1["MNC"].map(mnc_order).to_numpy()))
 
-            # print()
+        df1 = df1.iloc[order]
 
         return(df1)
 
@@ -94,7 +305,25 @@ class Hurestic_Dimensioning:
 
         """
 
-        transit_df = self.transit_df
+        return self.transmission_rates(OH)[mu]
+
+    def transmission_rates(self, OH):
+
+        """
+            Calculate Maximum Transmission Rate of all services, computed once
+            per overhead value
+
+            Args:
+                OH (float): Over Head value based on the Direction of data transfer, 
+                            Uplink or Downlink 
+            
+            Returns: 
+                Maximum Transmission Rate per service, indexed by mu
+
+        """
+
+        numerology = self.numerology
+        mu = numerology["mu"]
 
         # Rmax (if you don't know what is it, don't change). Value depends on the type of coding from 3GPP 38.212 and 3GPP 38.214 
         # (For LDPC code maximum number is 948/1024 = 0.92578125)
@@ -103,23 +332,29 @@ class Hurestic_Dimensioning:
         # Scaling Factor 
         f = self.simulation_parameters["Scaling_factor"]
 
+        key = (OH, R_max, f)
+        if key in self._transmission_rates:
+            return self._transmission_rates[key]
+
         # Tμs(j) = (10^-3)/(14*2^μ) – average OFDM symbol duration in a subframe for μ(i) value for normal cyclic prefix
         t_s_mu = 10**-3/(14* (2**mu))
 
         # Maximum number of MIMO layers ,3GPP 38.802: maximum 8 in DL, maximum 4 in UL
-        v_layers = transit_df[transit_df["mu"]==mu]["v_layers"].values[0]
+        v_layers = numerology["v_layers"]
 
         # Modulation order (QPSK-2, 16QAM-4, 64QAM-6, 256QAM-8)
-        Qm = transit_df[transit_df["mu"]==mu]["Qm"].values[0]
+        Qm = numerology["Qm"]
 
         V = v_layers * Qm * f * R_max
 
         # The maximum resource block allocation per service x is NRB
-        Nrb = transit_df[transit_df["mu"]==mu]["Nrb"].values[0]
+        Nrb = numerology["Nrb"]
 
         # Max Transmission Rate
         psi = 10**-6 * ( ( (V * Nrb * 12)/t_s_mu ) * (1 - OH) )
 
+        self._transmission_rates[key] = psi
+
         return(psi)
 
     def coverage_computation(self,fitered_data, p_tx, mu):
@@ -138,11 +373,34 @@ class Hurestic_Dimensioning:
                 E_x_cet_range           : power allocation on the cell edge throughput
         """
 
-        transit_df = self.transit_df
+        R_cov, E_x_cet_range = self.coverage_grid(fitered_data, [p_tx], [mu])
+
+        return(R_cov[0, 0].tolist(), E_x_cet_range[0, 0].tolist())
+
+    def coverage_grid(self,fitered_data, p_tx, mu):
+
+
+        """
+            Calculate Cell Radius and power allocation on the cell edge throughput
+            for every service, transmit power and row of the data at once
+
+            Args:
+                fitered_data (dataframe): Dataframe of top 3 MNC by sample
+                p_tx (list)             : Transmit Powers per gNB. 
+                mu   (list)             : Services (0,1,2)
+
+            Return:
+                R_cov                   : Cell Radius, array of shape
+                                          (services, transmit powers, rows)
+                E_x_cet_range           : power allocation on the cell edge throughput,
+                                          array of the same shape
+        """
+
+        numerology = self.numerology
 
 
         # number of total resource block
-        N_thr_RB = transit_df["Nrb"].sum()
+        N_thr_RB = numerology["Nrb"].sum()
 
         # Number fo sub carriers in the resource block
         N_SC = 12
@@ -159,24 +417,29 @@ class Hurestic_Dimensioning:
         d_bp = (4*math.pi*h_g_NB*h_UE)/lamda #breakpoint distance 
 
 
+        # services, transmit powers and rows along the three axes
+        mu = np.asarray(mu)[:, None, None]
+        p_tx = np.asarray(p_tx, dtype=float)[None, :, None]
+        samples = fitered_data["samples"].to_numpy(dtype=float)[None, None, :]
+        fc = fitered_data["MNC"].to_numpy(dtype=float)[None, None, :]
 
         # total number of physical resource block
-        N_x_RB = transit_df[transit_df["mu"]==mu]["Nrb"].values[0]
+        N_x_RB = numerology["Nrb"][mu]
 
         # The power available for service x
-        P_x_tx = p_tx - 10 * math.log10( (N_x_RB/N_thr_RB) )
+        P_x_tx = p_tx - 10 * np.log10( (N_x_RB/N_thr_RB) )
 
         # total number of sub carriers per x
         Nx = N_x_RB * N_SC
         
         # effective power per sub carrier
-        E_x = P_x_tx - 10 * math.log10(Nx)
+        E_x = P_x_tx - 10 * np.log10(Nx)
 
         # number of PRBs to provide CET
-        N_x_cet_range = N_x_RB /(.95 * fitered_data["samples"])
+        N_x_cet_range = N_x_RB /(.95 * samples)
 
         # power associated with the sub-carriers of these PRBs  
-        E_x_cet_range = [E_x + 10 * math.log10(N_x_cet * N_SC) for N_x_cet in N_x_cet_range]
+        E_x_cet_range = E_x + 10 * np.log10(N_x_cet_range * N_SC)
 
         
         # assumed cell load
@@ -186,11 +449,11 @@ class Hurestic_Dimensioning:
         L = -10 * math.log10(1-delta_cov)
 
         # PL_x_max determines the maximum cell range of a gNB
-        PL_x_max_range =  [E_x_cet - L for E_x_cet in E_x_cet_range]
+        PL_x_max_range = E_x_cet_range - L
 
 
         # Coverage cell range 
-        R_cov = [ 10 ** ((PL_max - ( 32.4  + 20 * math.log10(fc) - 9.5 *math.log10( (d_bp)**2 + (h_g_NB - h_UE)**2 ) + sigma))/40)  for PL_max, fc in zip(PL_x_max_range, fitered_data["MNC"]) ] 
+        R_cov = 10 ** ((PL_x_max_range - ( 32.4  + 20 * np.log10(fc) - 9.5 *math.log10( (d_bp)**2 + (h_g_NB - h_UE)**2 ) + sigma))/40)
 
         return(R_cov, E_x_cet_range)
 
@@ -210,62 +473,28 @@ class Hurestic_Dimensioning:
                 result : The threshold number of devices per gNB based on MNO’s requirements
         """
 
-        transit_df = self.transit_df
-
-
         # probability of active devices
         p = p2 + p3
 
-        # probability of non-active devices
-        p1 = 1-p
-        
-
-        P_k_ls=[]
-        r_circum_x_W_x_ls = []
-
 
         # data rate
-        r_x = transit_df[transit_df["mu"]==mu]["r_x"].values[0]
+        r_x = self.numerology["r_x"][mu]
 
         # the maximum number of active devices to provide rx in the given transmission bandwidth, DL in our case 
         W_x_max = math.floor(self.transmission_model(mu, OH= 0.08)/r_x)
-        # print(W_x_max)
-
-
-        result = 0
 
-        for W_x_k in range(W_x_max,W_x_thr+1, 1):
-            # eq 9
-            P_k = (math.factorial(W_x_thr)/( math.factorial(W_x_k) *  math.factorial(W_x_thr-W_x_k))) * (p2+p3)**W_x_k * (p1)**(W_x_thr-W_x_k)
-            P_k_ls.append(P_k)
 
+        # eq 14, the probability that at most W_x_max of W_x_k devices are
+        # active, for every W_x_k in [W_x_max, W_x_thr]. scipy evaluates the
+        # binomial cdf through the regularized incomplete beta function,
+        # without factorials, so large thresholds neither overflow nor underflow
+        W_x_k = np.arange(W_x_max, W_x_thr + 1)
+        prob = binom.cdf(W_x_max, W_x_k, p)
 
-            # eq 10
-            # the DL transmission rate, 
-            # We choose the DL as the representative case, compared to the UL, as significantly larger data rates are generaly required for DL applications
-            tr_DL = self.transmission_model(mu, OH= 0.08)/W_x_k
-            # print(tr_DL)
+        # the largest number of devices meeting the MNO's requirement
+        meets = np.flatnonzero(prob >= zeta)
+        result = int(W_x_k[meets[-1]]) if len(meets) else 0
 
-            # the data rate transmitted per device for service x, which depends on Wx at a given time instant
-            r_circum_x_W_x = min([tr_DL , r_x])
-            r_circum_x_W_x_ls.append(r_circum_x_W_x)
-
-            # eq 12
-            # The average expected data rate
-            E_r_circum_x = sum([p_k * r_circum_x_w_x  for p_k, r_circum_x_w_x in zip(P_k_ls, r_circum_x_W_x_ls) ])
-
-
-            # eq 13, the average number of active devices
-            E_W_x = p * W_x_thr
-
-
-            # eq 14
-            prob = sum([ (math.factorial(W_x_k)/( math.factorial(k) *  math.factorial(W_x_k-k))) * (p2+p3)**k * (p1)**(W_x_k-k)   for k in range(0,W_x_max+1)])
-
-            if prob >= zeta:
-                result = W_x_k
-                # break
-        
         return(result)
 
 
@@ -307,33 +536,35 @@ class Hurestic_Dimensioning:
             β += Wthr_x
         β = β*s
         R_x_cov = [0] * 1000
-        
+
+        # coverage of every service and transmit power, which does not depend on the MNC
+        Ptx = list(range(0, 10 + 1))
+        Ecet, r_cov = self.coverage_grid(fitered_data, Ptx, mu_ls)
+
+        δcap = np.arange(1, 100 + 1)
+
         for m_idx in m_list:
-            for x_idx in [1,2,3]:
-                for Ptx_variable in range(0, 10 + 1):
-                    Ecet,r_cov = self.coverage_computation(fitered_data, Ptx_variable, x_idx-1)
-                    Ecet_x = Ecet[x_idx]
-                    R_x_cov[m_idx] = r_cov[x_idx]
+            # of the services and transmit powers, the last ones set R_x_cov
+            R_x_cov[m_idx] = r_cov[-1, -1, 3]
             k = R_x_cov.index(min(R_x_cov))
             Rcov = R_x_cov[k]
             # δmin = int(top_3_mnc_samples[0])
             # δmax = int(top_3_mnc_samples[- 1])
-            Zcov = [math.inf] * 100
-            Zcap = [math.inf] * 100
-            for δcap in range(1, 100 + 1):
-                Ac = β * δcap / phim[m_idx]
-                Rcap = (Ac / Agm)**0.5
-                diff_R = abs(Rcov - Rcap)
-                diff_L = abs(δcov - δcap)
-                try:
-                    if diff_L <= 1 and diff_R <= 10:
-                        Zcov[δcap] = Agm / (1.95 * Rcov**2)
-                        Zcap[δcap] = Agm / Ac
-                except:
-                    pass
-            z = min(enumerate(zip(Zcov, Zcap)), key=lambda x: x[1])[0]
-            Ptx = list(range(0, 10 + 1))
-            results.append((Zcov[z], Zcap[z], Ptx[z]))
+            Zcov = np.full(100, math.inf)
+            Zcap = np.full(100, math.inf)
+            Ac = β * δcap / phim[m_idx]
+            Rcap = (Ac / Agm)**0.5
+            diff_R = np.abs(Rcov - Rcap)
+            diff_L = np.abs(δcov - δcap)
+            # δcap = 100 falls outside Zcov and Zcap, Zcov is left unset when
+            # Rcov is 0 and Zcap when Ac is 0
+            found = (diff_L <= 1) & (diff_R <= 10) & (δcap < 100)
+            if Rcov != 0:
+                Zcov[δcap[found]] = Agm / (1.95 * Rcov**2)
+                if β != 0:
+                    Zcap[δcap[found]] = Agm / Ac[found]
+            z = np.lexsort((Zcap, Zcov))[0]
+            results.append((float(Zcov[z]), float(Zcap[z]), Ptx[z]))
         return(results)
 
 
@@ -342,21 +573,19 @@ class Hurestic_Dimensioning:
 
         # col_names = ["Radio", "MCC", "MNC", "LAC", "CID", "Unit", "long", "lat", "radius", "samples", "changeble", "created", "updated", "Average_Signals"]
         # df = pd.read_csv(self.path_to_csv, names = col_names)
-        df_final = pd.read_csv(self.path_to_csv)
-        df_1 = df_final[['range', 'samples']]
+        # the optional 'cache' and 'cache_dir' parameters control the Parquet
+        # and clustering files saved for later runs
+        cache = self.simulation_parameters.get('cache', True)
+        cache_dir = self.simulation_parameters.get('cache_dir')
+
+        df_final = self.load_cells(mcc=self.simulation_parameters.get('mcc'),
+            mnc=self.simulation_parameters.get('mnc'), cache=cache,
+            cache_dir=cache_dir)
         k = 4
 
-        # Fit the K-means clustering model
-        kmeans = KMeans(n_clusters=k, random_state=0).fit(df_1)
-
-        # Add the cluster labels to the original DataFrame
-        df_final['cluster'] = kmeans.labels_
-
-        # Create separate DataFrames for each cluster
-        clustered_dfs = []
-        for cluster_id in range(k):
-            cluster_df = df_final[df_final['cluster'] == cluster_id].drop('cluster', axis=1)
-            clustered_dfs.append(cluster_df)
+        # Fit the K-means clustering model, or load it for data clustered before
+        kmeans, labels = self.cluster_cells(df_final, k, cache=cache,
+            cache_dir=cache_dir)
 
 
         def predict_cluster(range_value, sample_value, kmeans_model):
@@ -368,7 +597,8 @@ class Hurestic_Dimensioning:
         approx_sample_size = (self.simulation_parameters['a'] + self.simulation_parameters['b']) / 2
         predicted_cluster = predict_cluster(self.simulation_parameters['approx_range_of_cell'], approx_sample_size, kmeans)
 
-        df = clustered_dfs[predicted_cluster]
+        # keep the cells of the predicted cluster
+        df = df_final[labels == predicted_cluster]
         print(predicted_cluster)
 
         result = df.groupby(['MNC'])['samples'].sum()
@@ -4,6 +4,7 @@ import pandas as pd
 from sklearn import linear_model
 from sklearn.preprocessing import MinMaxScaler
 import math
+import threading
 import joblib
 
 
@@ -15,6 +16,44 @@ np.random.seed(42)
 packageFolder = os.path.dirname(mpa_sim.__file__)
 dataFolder = os.path.join(os.path.dirname(mpa_sim.__file__), "services", "pkls")
 
+# column order of the configurations passed to estimateCPU_Utilization_CU_DU_batch
+BATCH_FEATURES = ['Numerology', 'Bandwidth', 'Modulation', 'ru_du_ratio', 'Number_of_UEs', 'DL', 'UL']
+
+# models loaded in this process, by path, with the modification time of the file
+_models = {}
+_models_lock = threading.Lock()
+
+
+def load_cpu_models(savedModelPath):
+    """
+
+    Load the models saved in a file, once per process.
+
+    The models are kept in memory and only loaded again when the
+    modification time of the file changes.
+
+    Parameters
+    ----------
+    savedModelPath : str
+        joblib file holding model_CU, model_DU and scaler.
+
+    Returns
+    -------
+    models : tuple
+        model_CU, model_DU, scaler.
+
+    """
+    mtime = os.stat(savedModelPath).st_mtime_ns
+
+    with _models_lock:
+        cached = _models.get(savedModelPath)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, tuple(joblib.load(savedModelPath)))
+            _models[savedModelPath] = cached
+
+    return cached[1]
+
+
 class CPU_forecasting_model(object):
     """
 
@@ -26,7 +65,8 @@ class CPU_forecasting_model(object):
         A dict containing all simulation parameters necessary.
 
     dataFile : 
-        A csv file contains radisys test results.
+        A csv file contains radisys test results, only read when the
+        models are trained.
 
     """
 
@@ -34,8 +74,14 @@ class CPU_forecasting_model(object):
 
         self.simulation_parameters = simulation_parameters
 
-        dataFilePath = os.path.join(dataFolder, dataFile)
-        self.df = pd.read_csv(dataFilePath)
+        self.dataFilePath = os.path.join(dataFolder, dataFile)
+        self._df = None
+
+    @property
+    def df(self):
+        if self._df is None:
+            self._df = pd.read_csv(self.dataFilePath)
+        return self._df
 
     def updateModel(self):
 
@@ -72,6 +118,10 @@ class CPU_forecasting_model(object):
 
         joblib.dump([model_CU, model_DU, scaler], savedModelPath, compress=0)
 
+        with _models_lock:
+            _models[savedModelPath] = (os.stat(savedModelPath).st_mtime_ns,
+                (model_CU, model_DU, scaler))
+
         return True
 
     def loadModels(self, savedModelFile = "CPU_models.pkl"):
@@ -79,6 +129,9 @@ class CPU_forecasting_model(object):
 
         Load the prebuild models.
 
+        The models are shared by all instances and only loaded again from
+        disk when the saved file changes.
+
         Parameters
         ----------
             savedModelFile : a joblib saved models
@@ -96,7 +149,7 @@ class CPU_forecasting_model(object):
 
         """
         savedModelPath = os.path.join(dataFolder, savedModelFile)
-        model_CU, model_DU, scaler = joblib.load(savedModelPath)
+        model_CU, model_DU, scaler = load_cpu_models(savedModelPath)
 
         return model_CU, model_DU, scaler
 
@@ -169,6 +222,85 @@ class CPU_forecasting_model(object):
                 "CUCP_utils": CUCP_utils,
                 "CUUP_utils": CUUP_utils}
 
+    def estimateCPU_Utilization_CU_DU_batch(self, configurations, model_CU, model_DU, scaler):
+        """
+
+        estimate the CPU Utilization for CU and DU for many configurations at once.
+
+        Gives the same results as estimateCPU_Utilization_CU_DU, applying the
+        scaler and the models directly as array operations: one scaling of
+        all rows and one matrix product per model, with the CU-CP and CU-UP
+        rows stacked for the CU model.
+
+        Parameters
+        ----------
+        configurations : array_like
+            (N, 7) matrix with one configuration per row, with columns in
+            the order of BATCH_FEATURES: Numerology, Bandwidth, Modulation,
+            ru_du_ratio, Number_of_UEs, DL, UL.
+            Number_of_carriers, du_cuup_ratio, cucp_cuup_ratio and
+            signaling_overhead are taken from the simulation parameters.
+        model_CU : LinearRegression()
+            A pre-built sklearn Linear Regression Model.
+        model_DU : LinearRegression()
+            A pre-built sklearn Linear Regression Model.
+        scaler : MinMaxScaler()
+            returns a pre-built MinMax Scaler.
+
+
+        Returns
+        -------
+        utils : dict of arrays
+            "DU_utils", "CUCP_utils" and "CUUP_utils" percentages of overal
+            CPU Cores, one per configuration.
+
+        """
+        configurations = np.asarray(configurations, dtype=float)
+        if configurations.ndim != 2 or configurations.shape[1] != len(BATCH_FEATURES):
+            raise ValueError('configurations must be an (N, {}) matrix with columns {}'.format(
+                len(BATCH_FEATURES), BATCH_FEATURES))
+
+        ru_du_ratio = configurations[:, 3]
+        ues = configurations[:, 4]
+        dl = configurations[:, 5]
+        ul = configurations[:, 6]
+
+        carriers = self.simulation_parameters['Number_of_carriers']
+        du_cuup_ratio = self.simulation_parameters["du_cuup_ratio"]
+        cucp_cuup_ratio = self.simulation_parameters["cucp_cuup_ratio"]
+        signaling_overhead = self.simulation_parameters['signaling_overhead']
+
+        def rows(dl_factor, cell_x_ue):
+            X = np.empty((len(configurations), len(BATCH_FEATURES) + 1))
+            X[:, :5] = configurations[:, :5]
+            X[:, 5] = dl * dl_factor
+            X[:, 6] = ul * dl_factor
+            X[:, 7] = cell_x_ue
+            return X
+
+        X_du = rows(ru_du_ratio, ru_du_ratio * ues * carriers)
+
+        # proportion of traffic handled by CU_CP and by CU_UP
+        X_cu = np.vstack([
+            rows(signaling_overhead * ru_du_ratio * du_cuup_ratio * cucp_cuup_ratio,
+                 ru_du_ratio * ues * du_cuup_ratio * cucp_cuup_ratio * carriers),
+            rows((1-signaling_overhead) * ru_du_ratio * du_cuup_ratio,
+                 ru_du_ratio * ues * du_cuup_ratio * carriers),
+        ])
+
+        def scale(X):
+            X = X * scaler.scale_ + scaler.min_
+            if getattr(scaler, 'clip', False):
+                X = np.clip(X, *scaler.feature_range)
+            return X
+
+        DU_utils = scale(X_du) @ model_DU.coef_ + model_DU.intercept_
+        CU_utils = scale(X_cu) @ model_CU.coef_ + model_CU.intercept_
+
+        return {"DU_utils": DU_utils,
+                "CUCP_utils": CU_utils[:len(configurations)],
+                "CUUP_utils": CU_utils[len(configurations):]}
+
     def _estimateCPU_Utilization_CU_DU(self, model_CU, model_DU, scaler):
         """
 
@@ -1,94 +1,153 @@
-import pandas as pd
-import sklearn
-from sklearn.tree import DecisionTreeRegressor
-def overhead_per_server(type_of_server,type_of_virtualization,prop_or_not,n):
-    """overhead per server.
-    
-    Parameters
-    ----------
-    type_of_server : str
-        Type of server.
-        Here we consider 2 types of servers:
-        1.Dell PowerEdge T330 server
-        2.Dell PowerEdge T430 server
-
-    type_of_virtualization : str
-        There are three types of virtualization: 
-        1.KVM (Kernel-based Virtual Machine),
-        2.VirtualBox (VirtualBox) and
-        3.Docker (Docker).
-
-    prop_or_not : bool
-        Whether the server is receiving a proportional or non proportional workload.
-
-    n : int
-        Number of cpus in the server.
-        "Assuming each physical server has same no.of vms as the no.of cpus in the server." 
-
-    Returns
-    -------
-    overhead : float
-        overhead percentage per virtual server.
-    """
-    df_t330 = pd.read_csv('mpa_sim-PHOENIX-830_RAN_Cost_Modelling\tests\mpa_sim\static\t330.csv')
-    df_t430 = pd.read_csv('mpa_sim-PHOENIX-830_RAN_Cost_Modelling\tests\mpa_sim\static\t430.csv')
-
-    X_t330 = df_t330.drop('overhead', axis=1)
-    y_t330 = df_t330['overhead']
-
-    X_t430 = df_t430.drop('overhead', axis=1)
-    y_t430 = df_t430['overhead']
-
-    dtree_330 = DecisionTreeRegressor()
-    dtree_330.fit(X_t330, y_t330)
-
-    dtree_430 = DecisionTreeRegressor()
-    dtree_430.fit(X_t430, y_t430)
-
-
-    if type_of_server == 'Dell PowerEdge T330 server':
-        if type_of_virtualization == 'KVM':
-            if prop_or_not == True:
-                overhead = dtree_330.predict([[0,1, n]])
-            else:
-                overhead = dtree_330.predict([[0,0, n]])
-        elif type_of_virtualization == 'VirtualBox':
-            if prop_or_not == True:
-                overhead = dtree_330.predict([[1,1, n]])
-            else:
-                overhead = dtree_330.predict([[1,0, n]])
-        elif type_of_virtualization == 'Docker':
-            if prop_or_not == True:
-                overhead = dtree_330.predict([[2,1, n]])
-            else:
-                overhead = dtree_330.predict([[2,0, n]])
-        else:
-            print('Please enter a valid type of virtualization.')
-
-    elif type_of_server == 'Dell PowerEdge T430 server':
-        if type_of_virtualization == 'KVM':
-            if prop_or_not == True:
-                overhead = dtree_430.predict([[0,1, n]])
-            else:
-                overhead = dtree_430.predict([[0,0, n]])
-
-        elif type_of_virtualization == 'VirtualBox':
-            if prop_or_not == True:
-                overhead = dtree_430.predict([[1,1, n]])
-            else:
-                overhead = dtree_430.predict([[1,0, n]])
-
-        elif type_of_virtualization == 'Docker':
-            if prop_or_not == True:
-                overhead = dtree_430.predict([[2,1, n]])
-            else:
-                overhead = dtree_430.predict([[2,0, n]])
-
-        else:
-            print('Please enter a valid type of virtualization.')
-
-    else:
-        print('Please enter a valid type of server.')
-
-
-    return overhead[0]
\ No newline at end of file
+import os
+from functools import lru_cache
+
+import joblib
+import pandas as pd
+import sklearn
+from sklearn.tree import DecisionTreeRegressor
+
+
+packageFolder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+staticFolder = os.path.join(packageFolder, "static")
+dataFolder = os.path.join(packageFolder, "services", "pkls")
+savedModelPath = os.path.join(dataFolder, "overhead_models.pkl")
+
+# measured overhead per server type
+SERVERS = {
+    'Dell PowerEdge T330 server': 't330.csv',
+    'Dell PowerEdge T430 server': 't430.csv',
+}
+
+# encoding of the virtualization type in the measurements
+VIRTUALIZATIONS = {
+    'KVM': 0,
+    'VirtualBox': 1,
+    'Docker': 2,
+}
+
+_overhead_models = None
+
+
+def update_overhead_models(*, dataFolder=staticFolder, savedModelPath=savedModelPath):
+    """
+
+    Fit one overhead model per server type and save them into a file.
+
+    Parameters
+    ----------
+    dataFolder : str
+        Folder holding the t330.csv and t430.csv measurements.
+    savedModelPath : str
+        joblib file the models are saved into.
+
+    Returns
+    -------
+    models : dict
+        DecisionTreeRegressor per type of server.
+
+    """
+    global _overhead_models
+
+    models = {}
+    for type_of_server, dataFile in SERVERS.items():
+        df = pd.read_csv(os.path.join(dataFolder, dataFile))
+
+        X = df.drop('overhead', axis=1)
+        y = df['overhead']
+
+        dtree = DecisionTreeRegressor()
+        dtree.fit(X.values, y)
+        models[type_of_server] = dtree
+
+    joblib.dump(models, savedModelPath, compress=0)
+
+    _overhead_models = models
+    _overhead.cache_clear()
+
+    return models
+
+
+def load_overhead_models(*, savedModelPath=savedModelPath, dataFolder=staticFolder):
+    """
+
+    Load the overhead models, fitting and saving them first if no saved
+    models exist.
+
+    Parameters
+    ----------
+    savedModelPath : str
+        joblib file the models are loaded from or saved into.
+    dataFolder : str
+        Folder holding the measurements, used when no saved models exist.
+
+    Returns
+    -------
+    models : dict
+        DecisionTreeRegressor per type of server.
+
+    """
+    global _overhead_models
+
+    if not os.path.exists(savedModelPath):
+        return update_overhead_models(dataFolder=dataFolder,
+            savedModelPath=savedModelPath)
+
+    _overhead_models = joblib.load(savedModelPath)
+    _overhead.cache_clear()
+
+    return _overhead_models
+
+
+@lru_cache(maxsize=None)
+def _overhead(type_of_server, virtualization, proportional, n):
+    if _overhead_models is None:
+        load_overhead_models()
+
+    overhead = _overhead_models[type_of_server].predict(
+        [[virtualization, proportional, n]])
+
+    return overhead[0]
+
+
+def overhead_per_server(type_of_server,type_of_virtualization,prop_or_not,n):
+    """overhead per server.
+
+    The overhead models are fitted once and saved to `overhead_models.pkl`,
+    and each (server, virtualization, proportional, n) combination is only
+    predicted once.
+
+    Parameters
+    ----------
+    type_of_server : str
+        Type of server.
+        Here we consider 2 types of servers:
+        1.Dell PowerEdge T330 server
+        2.Dell PowerEdge T430 server
+
+    type_of_virtualization : str
+        There are three types of virtualization:
+        1.KVM (Kernel-based Virtual Machine),
+        2.VirtualBox (VirtualBox) and
+        3.Docker (Docker).
+
+    prop_or_not : bool
+        Whether the server is receiving a proportional or non proportional workload.
+
+    n : int
+        Number of cpus in the server.
+        "Assuming each physical server has same no.of vms as the no.of cpus in the server."
+
+    Returns
+    -------
+    overhead : float
+        overhead percentage per virtual server.
+    """
+    if type_of_server not in SERVERS:
+        raise ValueError('Invalid type of server: {}'.format(type_of_server))
+
+    if type_of_virtualization not in VIRTUALIZATIONS:
+        raise ValueError('Invalid type of virtualization: {}'.format(
+            type_of_virtualization))
+
+    return _overhead(type_of_server, VIRTUALIZATIONS[type_of_virtualization],
+        1 if prop_or_not == True else 0, n)
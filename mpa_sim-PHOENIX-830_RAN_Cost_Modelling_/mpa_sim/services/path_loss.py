@@ -1,11 +1,12 @@
 
 import numpy as np
 from math import pi, sqrt
+from collections import OrderedDict
 
 
 def path_loss_calculator(frequency, distance, ant_height, ant_type,
     building_height, street_width, settlement_type, type_of_sight,
-    ue_height, above_roof, indoor, seed_value, iterations):
+    ue_height, above_roof, indoor, seed_value, iterations, shadow_fading=None):
     """
     Calculate the correct path loss given a range of critera.
 
@@ -38,6 +39,10 @@ def path_loss_calculator(frequency, distance, ant_height, ant_type,
         Dictates repeatable random number generation.
     iterations : int
         Specifies how many iterations a specific calculation should be run for.
+    shadow_fading : ShadowFadingBank
+        Provider of the log-normal shadow fading values. Defaults to a
+        shared bank reproducing the per-call seeding of
+        `generate_log_normal_dist_value`.
 
     Returns
     -------
@@ -51,11 +56,12 @@ def path_loss_calculator(frequency, distance, ant_height, ant_type,
 
         path_loss = etsi_tr_138_901(frequency, distance, ant_height, ant_type,
             building_height, street_width, settlement_type, type_of_sight,
-            ue_height, above_roof, indoor, seed_value, iterations
+            ue_height, above_roof, indoor, seed_value, iterations,
+            shadow_fading
         )
 
         path_loss = path_loss + outdoor_to_indoor_path_loss(
-            frequency, indoor, seed_value
+            frequency, indoor, seed_value, shadow_fading
         )
 
         model = 'etsi_tr_138_901'
@@ -71,7 +77,7 @@ def path_loss_calculator(frequency, distance, ant_height, ant_type,
 
 def etsi_tr_138_901(frequency, distance, ant_height, ant_type,
     building_height, street_width, settlement_type, type_of_sight,
-    ue_height, above_roof, indoor, seed_value, iterations):
+    ue_height, above_roof, indoor, seed_value, iterations, shadow_fading=None):
     """
 
     Model requires:
@@ -84,6 +90,9 @@ def etsi_tr_138_901(frequency, distance, ant_height, ant_type,
     hut = effective user terminal height
 
     """
+    if shadow_fading is None:
+        shadow_fading = default_shadow_fading
+
     fc = frequency
     c = 3e8
 
@@ -110,7 +119,7 @@ def etsi_tr_138_901(frequency, distance, ant_height, ant_type,
                 20*np.log10(40*pi*d3d*fc/3) + min(0.03*h**1.72,10) *
                 np.log10(d3d) - min(0.044*h**1.72,14.77) +
                 0.002*np.log10(h)*d3d +
-                generate_log_normal_dist_value(fc, 1, 4, iterations, seed_value)
+                shadow_fading.value(fc, 1, 4, iterations, seed_value)
             )
 
             if 10 <= d2d <= dbp:
@@ -122,9 +131,9 @@ def etsi_tr_138_901(frequency, distance, ant_height, ant_type,
                 20*np.log10(40*pi*dbp*fc/3) + min(0.03*h**1.72,10) *
                 np.log10(dbp) - min(0.044*h**1.72,14.77) +
                 0.002*np.log10(h)*dbp +
-                generate_log_normal_dist_value(fc, 1, 4, iterations, seed_value) +
+                shadow_fading.value(fc, 1, 4, iterations, seed_value) +
                 40*np.log10(d3d / dbp) +
-                generate_log_normal_dist_value(fc, 1, 6, iterations, seed_value)
+                shadow_fading.value(fc, 1, 6, iterations, seed_value)
             )
 
             if dbp <= d2d <= 10000:
@@ -139,7 +148,7 @@ def etsi_tr_138_901(frequency, distance, ant_height, ant_type,
                     (24.37 - 3.7 * (h/hbs)**2)*np.log10(hbs) +
                     (43.42 - 3.1*np.log10(hbs))*(np.log10(d3d)-3) +
                     20*np.log10(fc) - (3.2 * (np.log10(11.75*hut))**2 - 4.97) +
-                    generate_log_normal_dist_value(fc, 1, 8, iterations, seed_value)
+                    shadow_fading.value(fc, 1, 8, iterations, seed_value)
                 )
 
                 # # currently does not cap at 5km, which this should
@@ -149,13 +158,13 @@ def etsi_tr_138_901(frequency, distance, ant_height, ant_type,
 
             if d2d > 10000:
                 return uma_nlos_optional(frequency, distance, ant_height, ue_height,
-                    seed_value, iterations)
+                    seed_value, iterations, shadow_fading)
 
         elif settlement_type == 'urban':
 
             pl1 = round(
                 28 + 22 * np.log10(d3d) + 20 * np.log10(fc) +
-                generate_log_normal_dist_value(fc, 1, 4, iterations, seed_value)
+                shadow_fading.value(fc, 1, 4, iterations, seed_value)
             )
 
             if 10 <= d2d <= d_apost_bp:
@@ -166,7 +175,7 @@ def etsi_tr_138_901(frequency, distance, ant_height, ant_type,
             pl2 = round(
                 28 + 40*np.log10(d3d) + 20 * np.log10(fc) -
                 9*np.log10((d_apost_bp)**2 + (hbs-hut)**2) +
-                generate_log_normal_dist_value(fc, 1, 4, iterations, seed_value)
+                shadow_fading.value(fc, 1, 4, iterations, seed_value)
             )
 
             if d_apost_bp <= d2d <= 5000:
@@ -180,12 +189,12 @@ def etsi_tr_138_901(frequency, distance, ant_height, ant_type,
                     pl_apostrophe_uma_nlos = round(
                         13.54 + 39.08 * np.log10(d3d) + 20 *
                         np.log10(fc) - 0.6 * (hut - 1.5) +
-                        generate_log_normal_dist_value(fc, 1, 6, iterations, seed_value)
+                        shadow_fading.value(fc, 1, 6, iterations, seed_value)
                     )
 
                 if d2d > 5000:
                     pl_apostrophe_uma_nlos = uma_nlos_optional(frequency, distance, ant_height,
-                        ue_height, seed_value, iterations)
+                        ue_height, seed_value, iterations, shadow_fading)
 
                 pl_uma_nlos = max(pl_apostrophe_uma_nlos, pl_uma_los)
 
@@ -200,7 +209,7 @@ def etsi_tr_138_901(frequency, distance, ant_height, ant_type,
 
             pl1 = round(
                 32.4 + 21 * np.log10(d3d) + 20 * np.log10(fc) +
-                generate_log_normal_dist_value(fc, 1, 4, iterations, seed_value)
+                shadow_fading.value(fc, 1, 4, iterations, seed_value)
             )
 
             if 10 <= d2d <= d_apost_bp:
@@ -211,7 +220,7 @@ def etsi_tr_138_901(frequency, distance, ant_height, ant_type,
             pl2 = round(
                 32.4 + 40*np.log10(d3d) + 20 * np.log10(fc) -
                 9.5*np.log10((d_apost_bp)**2 + (hbs-hut)**2) +
-                generate_log_normal_dist_value(fc, 1, 4, iterations, seed_value)
+                shadow_fading.value(fc, 1, 4, iterations, seed_value)
             )
 
             if d_apost_bp <= d2d <= 5000:
@@ -225,7 +234,7 @@ def etsi_tr_138_901(frequency, distance, ant_height, ant_type,
                     pl_apostrophe_umi_nlos = round(
                         35.3 * np.log10(d3d) + 22.4 +
                         21.3 * np.log10(fc) - 0.3 * (hut - 1.5) +
-                        generate_log_normal_dist_value(fc, 1, 7.82, iterations, seed_value)
+                        shadow_fading.value(fc, 1, 7.82, iterations, seed_value)
                     )
                 
                 else:
@@ -243,7 +252,7 @@ def etsi_tr_138_901(frequency, distance, ant_height, ant_type,
 
 
 def uma_nlos_optional(frequency, distance, ant_height, ue_height,
-    seed_value, iterations):
+    seed_value, iterations, shadow_fading=None):
     """
 
     UMa NLOS / Optional from ETSI TR 138.901 / 3GPP TR 38.901
@@ -264,6 +273,8 @@ def uma_nlos_optional(frequency, distance, ant_height, ue_height,
         Dictates repeatable random number generation.
     iterations : int
         Specifies iterations for a specific calculation.
+    shadow_fading : ShadowFadingBank
+        Provider of the log-normal shadow fading values.
 
     Returns
     -------
@@ -271,12 +282,15 @@ def uma_nlos_optional(frequency, distance, ant_height, ue_height,
         Path loss in decibels (dB)
 
     """
+    if shadow_fading is None:
+        shadow_fading = default_shadow_fading
+
     fc = frequency
     d3d = sqrt((distance)**2 + (ant_height - ue_height)**2)
 
     path_loss = 32.4 + 20*np.log10(fc) + 30*np.log10(d3d)
 
-    random_variation = generate_log_normal_dist_value(
+    random_variation = shadow_fading.value(
         frequency, 1, 7.8, iterations, seed_value
     )
 
@@ -360,7 +374,94 @@ def generate_log_normal_dist_value(frequency, mu, sigma, draws, seed_value):
     return round(np.mean(hs),2)
 
 
-def outdoor_to_indoor_path_loss(frequency, indoor, seed_value):
+class ShadowFadingBank(object):
+    """
+
+    Bounded cache of shadow fading values for the path loss models.
+
+    Every value is keyed by (frequency, mu, sigma, draws, seed_value) and
+    drawn once, so repeated path loss evaluations do no random number
+    work and leave the global NumPy random state untouched.
+
+    Parameters
+    ----------
+    seed : int
+        Seed of the simulation. When given, each value is drawn from its
+        own `numpy.random.Generator`, derived from the seed and the key so
+        that results do not depend on the order of evaluation. When None,
+        values are identical to those of `generate_log_normal_dist_value`.
+    maxsize : int
+        Maximum number of cached values.
+
+    """
+    def __init__(self, seed=None, maxsize=1024):
+
+        self.seed = seed
+        self.maxsize = maxsize
+        self._values = OrderedDict()
+
+
+    def value(self, frequency, mu, sigma, draws, seed_value):
+        """
+
+        Mean of the log-normal random variation, see
+        `generate_log_normal_dist_value`.
+
+        Returns
+        -------
+        random_variation : float
+            Mean of the random variation over the specified draws.
+
+        """
+        if seed_value is None and self.seed is None:
+            # nothing to reproduce, draw fresh values every time
+            return generate_log_normal_dist_value(
+                frequency, mu, sigma, draws, seed_value)
+
+        key = (frequency, mu, sigma, draws, seed_value)
+
+        if key in self._values:
+            self._values.move_to_end(key)
+            return self._values[key]
+
+        normal_std = np.sqrt(np.log10(1 + (sigma/mu)**2))
+        normal_mean = np.log10(mu) - normal_std**2 / 2
+
+        hs = self._generator(*key).lognormal(normal_mean, normal_std, draws)
+        random_variation = round(np.mean(hs),2)
+
+        self._values[key] = random_variation
+        if len(self._values) > self.maxsize:
+            self._values.popitem(last=False)
+
+        return random_variation
+
+
+    def _generator(self, frequency, mu, sigma, draws, seed_value):
+
+        if self.seed is None:
+            # same stream as the global state seeded in
+            # generate_log_normal_dist_value
+            frequency_seed_value = seed_value * frequency * 100
+            return np.random.RandomState(int(str(frequency_seed_value)[:2]))
+
+        spawn_key = (
+            int(round(frequency * 1e6)),
+            int(round(mu * 1e6)),
+            int(round(sigma * 1e6)),
+            int(draws),
+            0 if seed_value is None else int(seed_value),
+        )
+
+        return np.random.default_rng(
+            np.random.SeedSequence(self.seed, spawn_key=spawn_key))
+
+
+default_shadow_fading = ShadowFadingBank()
+
+
+def outdoor_to_indoor_path_loss(frequency, indoor, seed_value,
+    shadow_fading=None):
     """
 
     ITU-R M.1225 suggests building penetration loss for shadow fading can be modelled
@@ -373,6 +474,8 @@ def outdoor_to_indoor_path_loss(frequency, indoor, seed_value):
         Indicates if the user is indoor (True) or outdoor (False).
     seed_value : int
         Dictates repeatable random number generation.
+    shadow_fading : ShadowFadingBank
+        Provider of the log-normal shadow fading values.
 
     Returns
     -------
@@ -380,12 +483,272 @@ def outdoor_to_indoor_path_loss(frequency, indoor, seed_value):
         Outdoor to indoor path loss in decibels (dB)
 
     """
+    if shadow_fading is None:
+        shadow_fading = default_shadow_fading
+
     if indoor:
 
-        outdoor_to_indoor_path_loss = generate_log_normal_dist_value(frequency, 12, 8, 1, seed_value)
+        outdoor_to_indoor_path_loss = shadow_fading.value(frequency, 12, 8, 1, seed_value)
 
     else:
 
         outdoor_to_indoor_path_loss = 0
 
     return outdoor_to_indoor_path_loss
+
+
+def path_loss_calculator_batch(frequency, distance, ant_height, ant_type,
+    building_height, street_width, settlement_type, type_of_sight,
+    ue_height, above_roof, indoor, seed_value, iterations, shadow_fading=None):
+    """
+    Array version of `path_loss_calculator`.
+
+    Takes the same arguments, but distance, type_of_sight, ue_height and
+    indoor may be arrays (or scalars broadcast against them). The
+    stochastic terms are drawn once per call rather than once per point,
+    which gives the same values as the scalar model whenever a seed_value
+    is set.
+
+    Parameters
+    ----------
+    distance : array_like
+        Distance between the transmitter and receivers in meters.
+    type_of_sight : array_like
+        Either 'los'/'nlos' strings or booleans which are True for Line of
+        Sight.
+    ue_height : float or array_like
+        Height of the User Equipment.
+    indoor : bool or array_like
+        Indicates if each user is indoor (True) or outdoor (False).
+
+    Returns
+    -------
+    path_loss : array
+        Path loss in decibels (dB). NaN where the scalar model defines no
+        path loss (e.g. line of sight beyond the model's validity range).
+    model : string
+        Type of model used for path loss estimation.
+
+    """
+    if 0.05 < frequency <= 100:
+
+        path_loss = etsi_tr_138_901_batch(frequency, distance, ant_height,
+            ant_type, building_height, street_width, settlement_type,
+            type_of_sight, ue_height, above_roof, indoor, seed_value,
+            iterations, shadow_fading
+        )
+
+        path_loss = path_loss + outdoor_to_indoor_path_loss_batch(
+            frequency, indoor, seed_value, shadow_fading
+        )
+
+        model = 'etsi_tr_138_901'
+
+    else:
+
+        raise ValueError (
+            "frequency of {} is NOT within correct range".format(frequency)
+        )
+
+    return np.round(path_loss), model
+
+
+def etsi_tr_138_901_batch(frequency, distance, ant_height, ant_type,
+    building_height, street_width, settlement_type, type_of_sight,
+    ue_height, above_roof, indoor, seed_value, iterations, shadow_fading=None):
+    """
+
+    Array version of `etsi_tr_138_901`. Every branch of the scalar model is
+    evaluated on the whole array and selected per point with masks, in the
+    same order as the scalar model returns.
+
+    """
+    if shadow_fading is None:
+        shadow_fading = default_shadow_fading
+
+    distance = np.asarray(distance, dtype=float)
+    ue_height = np.asarray(ue_height, dtype=float)
+    type_of_sight = np.asarray(type_of_sight)
+    if type_of_sight.dtype.kind in 'US':
+        los = type_of_sight == 'los'
+    else:
+        los = type_of_sight.astype(bool)
+
+    distance, ue_height, los = np.broadcast_arrays(distance, ue_height, los)
+    nlos = ~los
+
+    fc = frequency
+    c = 3e8
+
+    he = 1 #enviroment_height
+    hbs = ant_height
+    hut = ue_height
+    h_apost_bs = ant_height - ue_height
+    h_apost_ut = ue_height - he
+    w = street_width # mean street width is 20m
+    h = building_height # mean building height
+
+    dbp = 2 * pi * hbs * hut * (fc * 1e9) / c
+    d_apost_bp = 4 * h_apost_bs * h_apost_ut * (fc*1e9) / c
+    d2d_in = 10 #mean d2d_in value
+    d2d_out = distance - d2d_in
+    d2d = d2d_out + d2d_in
+    d3d = np.sqrt((d2d_out + d2d_in)**2 + (hbs - hut)**2)
+
+    for value in np.unique(ue_height):
+        check_3gpp_applicability(building_height, street_width, ant_height, value)
+
+    path_loss = np.full(distance.shape, np.nan)
+    pending = np.ones(distance.shape, dtype=bool)
+
+    def select(mask, values):
+        mask = pending & mask
+        path_loss[mask] = np.broadcast_to(values, distance.shape)[mask]
+        pending[mask] = False
+
+    if ant_type == 'macro':
+        if settlement_type == 'suburban' or settlement_type == 'rural':
+            pl1 = np.round(
+                20*np.log10(40*pi*d3d*fc/3) + min(0.03*h**1.72,10) *
+                np.log10(d3d) - min(0.044*h**1.72,14.77) +
+                0.002*np.log10(h)*d3d +
+                shadow_fading.value(fc, 1, 4, iterations, seed_value)
+            )
+
+            select(los & (10 <= d2d) & (d2d <= dbp), pl1)
+
+            pl2 = np.round(
+                20*np.log10(40*pi*dbp*fc/3) + min(0.03*h**1.72,10) *
+                np.log10(dbp) - min(0.044*h**1.72,14.77) +
+                0.002*np.log10(h)*dbp +
+                shadow_fading.value(fc, 1, 4, iterations, seed_value) +
+                40*np.log10(d3d / dbp) +
+                shadow_fading.value(fc, 1, 6, iterations, seed_value)
+            )
+
+            select(los & (dbp <= d2d) & (d2d <= 10000), pl2)
+            pl_rma_los = pl2
+
+            pl_apostrophe_rma_nlos = np.round(
+                161.04 - 7.1 * np.log10(w)+7.5*np.log10(h) -
+                (24.37 - 3.7 * (h/hbs)**2)*np.log10(hbs) +
+                (43.42 - 3.1*np.log10(hbs))*(np.log10(d3d)-3) +
+                20*np.log10(fc) - (3.2 * (np.log10(11.75*hut))**2 - 4.97) +
+                shadow_fading.value(fc, 1, 8, iterations, seed_value)
+            )
+
+            select(nlos, np.maximum(pl_apostrophe_rma_nlos, pl_rma_los))
+
+            select(d2d > 10000, uma_nlos_optional_batch(frequency, distance,
+                ant_height, ue_height, seed_value, iterations, shadow_fading))
+
+        elif settlement_type == 'urban':
+
+            pl1 = np.round(
+                28 + 22 * np.log10(d3d) + 20 * np.log10(fc) +
+                shadow_fading.value(fc, 1, 4, iterations, seed_value)
+            )
+
+            select(los & (10 <= d2d) & (d2d <= d_apost_bp), pl1)
+
+            pl2 = np.round(
+                28 + 40*np.log10(d3d) + 20 * np.log10(fc) -
+                9*np.log10((d_apost_bp)**2 + (hbs-hut)**2) +
+                shadow_fading.value(fc, 1, 4, iterations, seed_value)
+            )
+
+            select(los & (d_apost_bp <= d2d) & (d2d <= 5000), pl2)
+            pl_uma_los = pl2
+
+            pl_apostrophe_uma_nlos = np.where(
+                d2d <= 5000,
+                np.round(
+                    13.54 + 39.08 * np.log10(d3d) + 20 *
+                    np.log10(fc) - 0.6 * (hut - 1.5) +
+                    shadow_fading.value(fc, 1, 6, iterations, seed_value)
+                ),
+                uma_nlos_optional_batch(frequency, distance, ant_height,
+                    ue_height, seed_value, iterations, shadow_fading)
+            )
+
+            select(nlos, np.maximum(pl_apostrophe_uma_nlos, pl_uma_los))
+
+        else:
+            raise ValueError('Did not recognise settlement_type')
+
+    elif ant_type == 'micro':
+
+            pl1 = np.round(
+                32.4 + 21 * np.log10(d3d) + 20 * np.log10(fc) +
+                shadow_fading.value(fc, 1, 4, iterations, seed_value)
+            )
+
+            select(los & (10 <= d2d) & (d2d <= d_apost_bp), pl1)
+
+            pl2 = np.round(
+                32.4 + 40*np.log10(d3d) + 20 * np.log10(fc) -
+                9.5*np.log10((d_apost_bp)**2 + (hbs-hut)**2) +
+                shadow_fading.value(fc, 1, 4, iterations, seed_value)
+            )
+
+            select(los & (d_apost_bp <= d2d) & (d2d <= 5000), pl2)
+            pl_umi_los = pl2
+
+            pl_apostrophe_umi_nlos = np.where(
+                d2d <= 5000,
+                np.round(
+                    35.3 * np.log10(d3d) + 22.4 +
+                    21.3 * np.log10(fc) - 0.3 * (hut - 1.5) +
+                    shadow_fading.value(fc, 1, 7.82, iterations, seed_value)
+                ),
+                0
+            )
+
+            select(nlos, np.maximum(pl_apostrophe_umi_nlos, pl_umi_los))
+
+    else:
+        raise ValueError('Did not recognise ant_type')
+
+    return path_loss
+
+
+def uma_nlos_optional_batch(frequency, distance, ant_height, ue_height,
+    seed_value, iterations, shadow_fading=None):
+    """
+
+    Array version of `uma_nlos_optional`.
+
+    """
+    if shadow_fading is None:
+        shadow_fading = default_shadow_fading
+
+    fc = frequency
+    d3d = np.sqrt((distance)**2 + (ant_height - ue_height)**2)
+
+    path_loss = 32.4 + 20*np.log10(fc) + 30*np.log10(d3d)
+
+    random_variation = shadow_fading.value(
+        frequency, 1, 7.8, iterations, seed_value
+    )
+
+    return np.round(path_loss + random_variation)
+
+
+def outdoor_to_indoor_path_loss_batch(frequency, indoor, seed_value,
+    shadow_fading=None):
+    """
+
+    Array version of `outdoor_to_indoor_path_loss`.
+
+    """
+    if shadow_fading is None:
+        shadow_fading = default_shadow_fading
+
+    indoor = np.asarray(indoor, dtype=bool)
+
+    if not indoor.any():
+        return np.zeros(indoor.shape)
+
+    outdoor_to_indoor_path_loss = shadow_fading.value(frequency, 12, 8, 1, seed_value)
+
+    return np.where(indoor, outdoor_to_indoor_path_loss, 0)
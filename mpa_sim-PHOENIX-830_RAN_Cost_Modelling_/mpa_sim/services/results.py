@@ -0,0 +1,327 @@
+"""
+
+Columnar storage for link budget results.
+
+Results are written into preallocated typed arrays instead of one dict per
+receiver, with string columns stored as small integer codes. Chunks can be
+written out to Parquet as they fill up. Values which are constant for a run
+are kept once per sink, as DataFrame attrs and Parquet schema metadata.
+
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+NUMERIC_COLUMNS = (
+    'path_loss',
+    'ave_inf_pl',
+    'received_power',
+    'distance',
+    'interference',
+    'ave_distance',
+    'noise',
+    'i_plus_n',
+    'sinr',
+    'spectral_efficiency',
+    'capacity_mbps',
+    'capacity_mbps_km2',
+    'receiver_x',
+    'receiver_y',
+    'fronthaul_capacity_mbps',
+    'signaling_overhead_mbps',
+)
+
+CATEGORICAL_COLUMNS = (
+    'type_of_sight',
+    'modulation',
+)
+
+ID_COLUMN = 'id'
+
+RUN_ATTRS = (
+    'r_model',
+    'i_model',
+    'network_load',
+    'tranmission_type',
+)
+
+
+class LinkBudgetSink(object):
+    """
+
+    Typed column store for the output of `estimate_link_budget` and
+    `estimate_link_budget_batch`.
+
+    Numeric columns are kept in one array per column. `type_of_sight` and
+    `modulation` are kept as int8 codes into a list of categories, and the
+    receiver `id` as int32 codes into the list of ids seen, with `-1` for a
+    missing value. The model names, network load and transmission type are
+    constant for a run and kept once in `attrs`.
+
+    Parameters
+    ----------
+    capacity : int
+        Number of rows preallocated. Without `path` the arrays double in
+        size when full, with `path` each full chunk is written to the
+        Parquet file.
+    path : string
+        Optional Parquet file the results are written to in chunks of
+        `capacity` rows. Requires pyarrow.
+    dtype : numpy dtype
+        Type of the numeric columns.
+
+    """
+    def __init__(self, capacity=65536, path=None, dtype=np.float64):
+        if capacity < 1:
+            raise ValueError('capacity must be positive: {}'.format(capacity))
+        if path is not None and pa is None:
+            raise ImportError('pyarrow is required to write Parquet files')
+
+        self.capacity = capacity
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.rows_written = 0
+        self._writer = None
+        self.attrs = {}
+        self._categories = {key: [] for key in CATEGORICAL_COLUMNS}
+        self._ids = []
+        self._id_codes = {}
+        self._allocate(capacity)
+
+
+    def __len__(self):
+        return self._size
+
+
+    def _allocate(self, capacity):
+        self._size = 0
+        self._numeric = {
+            key: np.empty(capacity, dtype=self.dtype)
+            for key in NUMERIC_COLUMNS
+        }
+        self._codes = {
+            key: np.empty(capacity, dtype=np.int8)
+            for key in CATEGORICAL_COLUMNS
+        }
+        self._codes[ID_COLUMN] = np.empty(capacity, dtype=np.int32)
+
+
+    def _grow(self, capacity):
+        for columns in (self._numeric, self._codes):
+            for key, values in columns.items():
+                grown = np.empty(capacity, dtype=values.dtype)
+                grown[:self._size] = values[:self._size]
+                columns[key] = grown
+
+
+    def _encode(self, key, values):
+        categories = self._categories[key]
+        codes = np.full(len(values), -1, dtype=np.int8)
+
+        values = np.asarray(values, dtype=object)
+        for name in set(values[values != None]):
+            if name not in categories:
+                if len(categories) == np.iinfo(np.int8).max:
+                    raise ValueError('Too many categories for {}'.format(key))
+                categories.append(name)
+            codes[values == name] = categories.index(name)
+
+        return codes
+
+
+    def _encode_ids(self, values, n):
+        codes = np.full(n, -1, dtype=np.int32)
+        if values is None:
+            return codes
+
+        for idx, value in enumerate(values):
+            code = self._id_codes.get(value)
+            if code is None:
+                code = self._id_codes[value] = len(self._ids)
+                self._ids.append(value)
+            codes[idx] = code
+
+        return codes
+
+
+    def _set_attrs(self, attrs):
+        for key, value in attrs.items():
+            if key in self.attrs and self.attrs[key] != value:
+                raise ValueError('{} differs within one sink: {} and {}'.format(
+                    key, self.attrs[key], value))
+            self.attrs[key] = value
+
+
+    def _numeric_values(self, values):
+        values = np.asarray(values)
+        if values.dtype == object:
+            # the per-receiver path gives None where the lookup table has
+            # no spectral efficiency
+            values = np.array([np.nan if value is None else value
+                for value in values], dtype=float)
+
+        return values
+
+
+    def append(self, results, attrs=None):
+        """
+
+        Append a batch of results.
+
+        Parameters
+        ----------
+        results : dict of arrays
+            Result columns as returned by `estimate_link_budget_batch`,
+            with an optional `id` column.
+        attrs : dict
+            Values constant for the run, e.g. the model names. A value
+            differing from the one already held raises a ValueError.
+
+        """
+        n = len(results['sinr'])
+        start = 0
+
+        self._set_attrs(attrs or {})
+
+        numeric = {
+            key: self._numeric_values(results[key])
+            for key in NUMERIC_COLUMNS
+        }
+        codes = {
+            key: self._encode(key, results[key])
+            for key in CATEGORICAL_COLUMNS
+        }
+        codes[ID_COLUMN] = self._encode_ids(results.get(ID_COLUMN), n)
+
+        while start < n:
+            free = len(self._codes['modulation']) - self._size
+            if free == 0:
+                if self.path is None:
+                    self._grow(2 * len(self._codes['modulation']))
+                    continue
+                self.flush()
+                free = self.capacity
+
+            stop = min(n, start + free)
+            rows = slice(self._size, self._size + stop - start)
+
+            for key in NUMERIC_COLUMNS:
+                self._numeric[key][rows] = numeric[key][start:stop]
+            for key in codes:
+                self._codes[key][rows] = codes[key][start:stop]
+
+            self._size += stop - start
+            start = stop
+
+
+    def append_record(self, record):
+        """
+
+        Append a single result.
+
+        Parameters
+        ----------
+        record : dict
+            Result of a single receiver, as produced by
+            `estimate_link_budget`.
+
+        """
+        self.append({key: [record[key]] for key in
+            (ID_COLUMN,) + NUMERIC_COLUMNS + CATEGORICAL_COLUMNS},
+            {key: record[key] for key in RUN_ATTRS})
+
+
+    def to_dataframe(self):
+        """
+
+        Results held in memory as a DataFrame, with categorical `id`,
+        `type_of_sight` and `modulation` columns and the run values in
+        `attrs`.
+
+        """
+        data = {}
+        data[ID_COLUMN] = pd.Categorical.from_codes(
+            self._codes[ID_COLUMN][:self._size], self._ids)
+        for key in NUMERIC_COLUMNS:
+            data[key] = self._numeric[key][:self._size]
+        for key in CATEGORICAL_COLUMNS:
+            data[key] = pd.Categorical.from_codes(
+                self._codes[key][:self._size], self._categories[key])
+
+        df = pd.DataFrame(data)
+        df.attrs.update(self.attrs)
+
+        return df
+
+
+    def to_arrow(self):
+        """
+
+        Results held in memory as a pyarrow Table, with dictionary encoded
+        `id`, `type_of_sight` and `modulation` columns and the run values
+        as JSON in the schema metadata.
+
+        """
+        if pa is None:
+            raise ImportError('pyarrow is required for Arrow output')
+
+        codes = self._codes[ID_COLUMN][:self._size]
+        arrays = [pa.DictionaryArray.from_arrays(
+            pa.array(codes, mask=codes < 0),
+            pa.array(self._ids) if self._ids else pa.array([], type=pa.string()))]
+        for key in NUMERIC_COLUMNS:
+            arrays.append(pa.array(self._numeric[key][:self._size]))
+        for key in CATEGORICAL_COLUMNS:
+            codes = self._codes[key][:self._size]
+            arrays.append(pa.DictionaryArray.from_arrays(
+                pa.array(codes, mask=codes < 0),
+                pa.array(self._categories[key], type=pa.string())))
+
+        return pa.Table.from_arrays(arrays,
+            names=[ID_COLUMN] + list(NUMERIC_COLUMNS + CATEGORICAL_COLUMNS),
+            metadata={key: json.dumps(value)
+                for key, value in self.attrs.items()})
+
+
+    def flush(self):
+        """
+
+        Write the rows held in memory to the Parquet file and clear them.
+
+        """
+        if self.path is None:
+            raise ValueError('No Parquet path set for this sink')
+        if not self._size:
+            return
+
+        table = self.to_arrow()
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+
+        self.rows_written += self._size
+        self._allocate(self.capacity)
+
+
+    def close(self):
+        """
+
+        Flush any remaining rows and close the Parquet file.
+
+        """
+        if self.path is None:
+            return
+
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
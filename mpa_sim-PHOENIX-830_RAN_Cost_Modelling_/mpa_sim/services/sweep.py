@@ -0,0 +1,274 @@
+"""
+
+Monte Carlo sweeps over site radius, spectrum, environment and antenna type.
+
+Each combination is an independent job, run in a pool of worker processes.
+Jobs get their own deterministic seed, so results do not depend on the
+number of workers or the order in which jobs finish.
+
+"""
+import os
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from shapely.geometry import shape, Point
+
+from mpa_sim.services.generate_hex import produce_sites_and_site_areas
+from mpa_sim.services.system_simulator import SimulationManager
+
+
+def generate_receivers(site_area, simulation_parameters, quantity, seed=None):
+    """
+
+    Generate receivers uniformly distributed over the site area.
+
+    Parameters
+    ----------
+    site_area : list of dicts
+        Contains a geojson dict for the transmitter site area.
+    simulation_parameters : dict
+        A dict containing all simulation parameters necessary.
+    quantity : int
+        Number of receivers to generate.
+    seed : int
+        Seed for the receiver locations and indoor assignment.
+
+    Returns
+    -------
+    receivers : list of dicts
+        Contains a geojson dict for each receiver.
+
+    """
+    polygon = shape(site_area[0]['geometry'])
+    minx, miny, maxx, maxy = polygon.bounds
+    random_state = np.random.RandomState(seed)
+
+    receivers = []
+    while len(receivers) < quantity:
+        x, y = random_state.uniform((minx, miny), (maxx, maxy))
+        if not polygon.contains(Point(x, y)):
+            continue
+
+        indoor = bool(random_state.uniform(0, 100) <
+            simulation_parameters['indoor_users_percentage'])
+
+        receivers.append({
+            'type': 'Feature',
+            'geometry': {
+                'type': 'Point',
+                'coordinates': (x, y),
+            },
+            'properties': {
+                'ue_id': 'id_{}'.format(len(receivers)),
+                'misc_losses': simulation_parameters['rx_misc_losses'],
+                'gain': simulation_parameters['rx_gain'],
+                'losses': simulation_parameters['rx_losses'],
+                'ue_height': float(simulation_parameters['rx_height']),
+                'indoor': indoor,
+            }
+        })
+
+    return receivers
+
+
+def sweep_jobs(site_radii, spectrum_portfolio, environments, ant_types,
+    seed=None):
+    """
+
+    Expand the sweep dimensions into a list of jobs.
+
+    Parameters
+    ----------
+    site_radii : list of ints
+        Distances between transmitter and site edge in meters.
+    spectrum_portfolio : list of tuples
+        (frequency, bandwidth) pairs in GHz and MHz.
+    environments : list of strings
+        Each either urban, suburban or rural.
+    ant_types : list of strings
+        Each either macro or micro.
+    seed : int
+        Root seed from which every job seed is derived.
+
+    Returns
+    -------
+    jobs : list of dicts
+        One dict per combination, with its own `seed`.
+
+    """
+    jobs = []
+
+    combinations = itertools.product(site_radii, spectrum_portfolio,
+        environments, ant_types)
+
+    for job_id, (site_radius, (frequency, bandwidth), environment,
+        ant_type) in enumerate(combinations):
+
+        # derived from the job position only, so the seed does not change
+        # with the number of workers or the completion order
+        job_seed = np.random.SeedSequence(seed, spawn_key=(job_id,))
+
+        jobs.append({
+            'job_id': job_id,
+            'site_radius': site_radius,
+            'frequency': frequency,
+            'bandwidth': bandwidth,
+            'environment': environment,
+            'ant_type': ant_type,
+            'seed': int(job_seed.generate_state(1)[0]),
+        })
+
+    return jobs
+
+
+def run_sweep_job(job, geometry, generation, transmission_type,
+    modulation_and_coding_lut, simulation_parameters, receivers_per_site):
+    """
+
+    Run a single sweep job.
+
+    Parameters
+    ----------
+    job : dict
+        A job produced by `sweep_jobs`.
+    geometry : tuple
+        Output of `produce_sites_and_site_areas` for the job site radius.
+    generation : string
+        Either 4G or 5G dependent on technology.
+    transmission_type : string
+        Transmission type (SISO, MIMO etc.).
+    modulation_and_coding_lut : list of tuples
+        A lookup table containing modulation and coding rates,
+        spectral efficiencies and SINR estimates.
+    simulation_parameters : dict
+        A dict containing all simulation parameters necessary.
+    receivers_per_site : int
+        Number of receivers to simulate.
+
+    Returns
+    -------
+    results : pandas.DataFrame
+        One row per receiver, prefixed by the job columns.
+
+    """
+    transmitter, interfering_transmitters, site_area, _ = geometry
+
+    simulation_parameters = dict(simulation_parameters,
+        shadow_fading_seed=job['seed'])
+
+    receivers = generate_receivers(site_area, simulation_parameters,
+        receivers_per_site, job['seed'])
+
+    manager = SimulationManager(transmitter, interfering_transmitters,
+        job['ant_type'], receivers, site_area, simulation_parameters)
+
+    results = manager.estimate_link_budget_batch(
+        frequency=job['frequency'],
+        bandwidth=job['bandwidth'],
+        generation=generation,
+        ant_type=job['ant_type'],
+        tranmission_type=transmission_type,
+        environment=job['environment'],
+        modulation_and_coding_lut=modulation_and_coding_lut,
+        simulation_parameters=simulation_parameters,
+        **manager.receiver_arrays()
+    )
+
+    results = pd.DataFrame(results)
+    for column, key in enumerate(('job_id', 'site_radius', 'frequency',
+        'bandwidth', 'environment', 'ant_type')):
+        results.insert(column, key, job[key])
+
+    return results
+
+
+def run_sweep(unprojected_point, site_radii, spectrum_portfolio,
+    environments, ant_types, generation, transmission_type,
+    modulation_and_coding_lut, simulation_parameters, output_path,
+    unprojected_crs='epsg:4326', projected_crs='epsg:3857',
+    receivers_per_site=100, seed=None, max_workers=None):
+    """
+
+    Run every sweep job in a pool of worker processes, appending results to
+    a csv file as each job finishes.
+
+    The site geometry is produced once per site radius and shared by all
+    jobs with that radius.
+
+    Parameters
+    ----------
+    unprojected_point : tuple
+        x and y coordinates for an unprojected point.
+    site_radii : list of ints
+        Distances between transmitter and site edge in meters.
+    spectrum_portfolio : list of tuples
+        (frequency, bandwidth) pairs in GHz and MHz.
+    environments : list of strings
+        Each either urban, suburban or rural.
+    ant_types : list of strings
+        Each either macro or micro.
+    generation : string
+        Either 4G or 5G dependent on technology.
+    transmission_type : string
+        Transmission type (SISO, MIMO etc.).
+    modulation_and_coding_lut : list of tuples
+        A lookup table containing modulation and coding rates,
+        spectral efficiencies and SINR estimates.
+    simulation_parameters : dict
+        A dict containing all simulation parameters necessary.
+    output_path : string
+        Path of the csv file results are written to.
+    unprojected_crs : string
+        Coordinate Reference System of `unprojected_point`.
+    projected_crs : string
+        Projected Coordinate Reference System used for the simulation.
+    receivers_per_site : int
+        Number of receivers to simulate per job.
+    seed : int
+        Root seed for the sweep.
+    max_workers : int
+        Number of worker processes, all cores by default. With `1` the jobs
+        run in the calling process.
+
+    Returns
+    -------
+    jobs : list of dicts
+        The jobs that were run.
+
+    """
+    jobs = sweep_jobs(site_radii, spectrum_portfolio, environments,
+        ant_types, seed)
+
+    geometry = {}
+    for site_radius in site_radii:
+        if site_radius not in geometry:
+            geometry[site_radius] = produce_sites_and_site_areas(
+                unprojected_point, site_radius, unprojected_crs, projected_crs)
+
+    if os.path.exists(output_path):
+        os.remove(output_path)
+
+    def write(results):
+        results.to_csv(output_path, mode='a', index=False,
+            header=not os.path.exists(output_path))
+
+    arguments = (generation, transmission_type, modulation_and_coding_lut,
+        simulation_parameters, receivers_per_site)
+
+    if max_workers == 1:
+        for job in jobs:
+            write(run_sweep_job(job, geometry[job['site_radius']], *arguments))
+        return jobs
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(run_sweep_job, job, geometry[job['site_radius']],
+                *arguments)
+            for job in jobs
+        ]
+        for future in as_completed(futures):
+            write(future.result())
+
+    return jobs
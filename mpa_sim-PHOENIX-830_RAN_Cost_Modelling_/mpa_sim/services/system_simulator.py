@@ -8,9 +8,12 @@ from rtree import index
 from shapely.geometry import shape, Point, LineString
 import numpy as np
 from itertools import tee
+from bisect import bisect_right
+from functools import lru_cache
 from collections import OrderedDict
 
-from mpa_sim.services.path_loss import path_loss_calculator
+from mpa_sim.services.path_loss import (path_loss_calculator,
+    path_loss_calculator_batch, ShadowFadingBank)
 from mpa_sim.services.fronthaul import fronthaul_sim
 
 np.random.seed(42)
@@ -50,6 +53,16 @@ class SimulationManager(object):
                 )
             self.interfering_transmitters[site_id] = site_object
 
+        # spatial index over the interfering transmitters, keyed by their
+        # position in self.interfering_transmitters
+        self.interferer_coordinates = np.array(
+            [interferer.coordinates for interferer in
+             self.interfering_transmitters.values()],
+            dtype=float).reshape(-1, 2)
+        self.interferer_index = index.Index()
+        for idx, (x, y) in enumerate(self.interferer_coordinates):
+            self.interferer_index.insert(idx, (x, y, x, y))
+
         for receiver in receivers:
             receiver_id = receiver['properties']["ue_id"]
             receiver = Receiver(receiver, simulation_parameters)
@@ -57,10 +70,16 @@ class SimulationManager(object):
 
         self.fronthaul = fronthaul_sim(simulation_parameters)
 
+        # per-simulation shadow fading, optionally seeded with
+        # 'shadow_fading_seed'
+        self.shadow_fading = ShadowFadingBank(
+            simulation_parameters.get('shadow_fading_seed')
+            )
+
 
     def estimate_link_budget(self, frequency, bandwidth,
         generation, ant_type, tranmission_type, environment,
-        modulation_and_coding_lut, simulation_parameters):
+        modulation_and_coding_lut, simulation_parameters, sink=None):
         """
 
         Takes propagation parameters and calculates link budget capacity.
@@ -84,15 +103,23 @@ class SimulationManager(object):
             spectral efficiencies and SINR estimates.
         simulation_parameters : dict
             A dict containing all simulation parameters necessary.
+        sink : LinkBudgetSink
+            Optional column store the results are appended to, instead of
+            being collected as a list of dicts.
 
         Returns
         -------
         results : List of dicts
-            Each dict is an individual simulation result.
+            Each dict is an individual simulation result. When a `sink` is
+            given, the sink is returned instead.
 
         """
         results = []
 
+        mcs_table = modulation_and_coding_table(
+            modulation_and_coding_lut, generation
+        )
+
         for receiver in self.receivers.values():
 
             path_loss, r_model, r_distance, type_of_sight = self.estimate_path_loss(
@@ -115,13 +142,7 @@ class SimulationManager(object):
                 simulation_parameters
                 )
 
-            spectral_efficiency = self.estimate_spectral_efficiency(
-                sinr, generation, modulation_and_coding_lut
-            )
-
-            modulation = self.estimate_modulation(
-                sinr, generation, modulation_and_coding_lut
-            )
+            spectral_efficiency, modulation = mcs_table.lookup_value(sinr)
 
             capacity_mbps, capacity_mbps_km2 = (
                 self.estimate_average_capacity(
@@ -137,7 +158,7 @@ class SimulationManager(object):
                 capacity_mbps, simulation_parameters
                 )
 
-            results.append({
+            result = {
                 'id': receiver.id,
                 'path_loss': path_loss,
                 'r_model': r_model,
@@ -161,11 +182,197 @@ class SimulationManager(object):
                 'receiver_y': receiver.coordinates[1],
                 'fronthaul_capacity_mbps': fronthaul_capacity_mbps,
                 'signaling_overhead_mbps': signaling_overhead_mbps
-                })
+                }
+
+            if sink is not None:
+                sink.append_record(result)
+            else:
+                results.append(result)
+
+        if sink is not None:
+            return sink
+
+        return results
+
+
+    def estimate_link_budget_batch(self, coordinates, frequency, bandwidth,
+        generation, ant_type, tranmission_type, environment,
+        modulation_and_coding_lut, simulation_parameters, ue_height=None,
+        gain=None, losses=None, misc_losses=None, indoor=False, ids=None,
+        sink=None):
+        """
+
+        Array version of `estimate_link_budget` for large receiver sets.
+
+        All receivers are processed in one pass and the results are
+        returned column by column, with the same values as the per-receiver
+        path.
+
+        Parameters
+        ----------
+        coordinates : array_like
+            (N, 2) array of receiver x and y coordinates.
+        frequency : float
+            The carrier frequency for the chosen spectrum band (GHz).
+        bandwidth : int
+            The bandwidth of the carrier frequency (MHz).
+        generation : string
+            Either 4G or 5G dependent on technology.
+        ant_type : str
+            Type of antenna (macro, small etc.).
+        tranmission_type : string
+            Transmission type (SISO, MIMO etc.).
+        environment : string
+            Either urban, suburban or rural.
+        modulation_and_coding_lut : list of tuples
+            A lookup table containing modulation and coding rates,
+            spectral efficiencies and SINR estimates.
+        simulation_parameters : dict
+            A dict containing all simulation parameters necessary.
+        ue_height, gain, losses, misc_losses : float or array_like
+            Receiver characteristics, either one value for all receivers or
+            one value per receiver. Default to the `rx_*` simulation
+            parameters.
+        indoor : bool or array_like
+            Indicates if each user is indoor (True) or outdoor (False).
+        ids : array_like
+            Optional receiver ids, returned as the `id` column.
+        sink : LinkBudgetSink
+            Optional column store the results are appended to, with the
+            values constant for the run as its attrs.
+
+        Returns
+        -------
+        results : dict of arrays
+            One array of length N per result column. Columns which are
+            constant for a run (model names, network load and transmission
+            type) are not repeated. When a `sink` is given, the sink is
+            returned instead.
+
+        """
+        coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+        n = coordinates.shape[0]
+
+        ue_height = self._receiver_column(
+            ue_height, simulation_parameters['rx_height'], n)
+        gain = self._receiver_column(
+            gain, simulation_parameters['rx_gain'], n)
+        losses = self._receiver_column(
+            losses, simulation_parameters['rx_losses'], n)
+        misc_losses = self._receiver_column(
+            misc_losses, simulation_parameters['rx_misc_losses'], n)
+        indoor = np.broadcast_to(np.asarray(indoor, dtype=bool), (n,))
+
+        path_loss, r_model, r_distance, los = self._estimate_path_loss_batch(
+            coordinates, frequency, environment, simulation_parameters,
+            ue_height, indoor
+        )
+
+        received_power = self._estimate_received_power_batch(
+            path_loss, gain, losses, misc_losses
+        )
+
+        interference, i_model, ave_distance, ave_inf_pl = \
+            self._estimate_interference_batch(
+                coordinates, frequency, environment, simulation_parameters,
+                ue_height, gain, losses, misc_losses, indoor
+            )
+
+        noise = self.estimate_noise(
+            bandwidth
+        )
+
+        raw_sum_of_interference, i_plus_n, sinr = self._estimate_sinr_batch(
+            received_power, interference, noise, simulation_parameters
+        )
+
+        spectral_efficiency, modulation = modulation_and_coding_table(
+            modulation_and_coding_lut, generation
+        ).lookup(sinr)
+
+        capacity_mbps, capacity_mbps_km2 = self.estimate_average_capacity(
+            bandwidth, spectral_efficiency
+        )
+
+        fronthaul_capacity_mbps = capacity_mbps.copy()
+        if simulation_parameters['modulation_compression']:
+            for name in set(modulation[modulation != None]):
+                mask = (modulation == name) & (capacity_mbps > 0)
+                fronthaul_capacity_mbps[mask] = (
+                    capacity_mbps[mask] *
+                    simulation_parameters['compression_ratio'][name]
+                )
+
+        signaling_overhead_mbps = self.estimate_signaling_overhead(
+            capacity_mbps, simulation_parameters
+        )
+
+        results = {}
+        if ids is not None:
+            results['id'] = np.asarray(ids).reshape(n)
+
+        results.update({
+            'path_loss': path_loss,
+            'type_of_sight': np.where(los, 'los', 'nlos'),
+            'ave_inf_pl': ave_inf_pl,
+            'received_power': received_power,
+            'distance': r_distance,
+            'interference': np.log10(raw_sum_of_interference),
+            'ave_distance': ave_distance,
+            'noise': np.full(n, noise),
+            'i_plus_n': np.log10(i_plus_n),
+            'sinr': sinr,
+            'spectral_efficiency': spectral_efficiency,
+            'modulation': modulation,
+            'capacity_mbps': capacity_mbps,
+            'capacity_mbps_km2': capacity_mbps_km2,
+            'receiver_x': coordinates[:, 0],
+            'receiver_y': coordinates[:, 1],
+            'fronthaul_capacity_mbps': fronthaul_capacity_mbps,
+            'signaling_overhead_mbps': signaling_overhead_mbps,
+        })
+
+        if sink is not None:
+            sink.append(results, {
+                'r_model': r_model,
+                'i_model': i_model,
+                'network_load': simulation_parameters['network_load'],
+                'tranmission_type': tranmission_type,
+            })
+            return sink
 
         return results
 
 
+    def receiver_arrays(self):
+        """
+
+        Collect the receivers of this manager into the keyword arrays
+        expected by `estimate_link_budget_batch`.
+
+        Returns
+        -------
+        arrays : dict
+            Receiver ids, coordinates and characteristics, in receiver
+            order.
+
+        """
+        receivers = list(self.receivers.values())
+
+        return {
+            'ids': np.array([receiver.id for receiver in receivers]),
+            'coordinates': np.array(
+                [receiver.coordinates for receiver in receivers],
+                dtype=float).reshape(-1, 2),
+            'ue_height': np.array([r.ue_height for r in receivers], dtype=float),
+            'gain': np.array([r.gain for r in receivers], dtype=float),
+            'losses': np.array([r.losses for r in receivers], dtype=float),
+            'misc_losses': np.array(
+                [r.misc_losses for r in receivers], dtype=float),
+            'indoor': np.array([r.indoor for r in receivers], dtype=bool),
+        }
+
+
     def estimate_path_loss(self, receiver, frequency,environment,
         simulation_parameters):
         """
@@ -237,7 +444,8 @@ class SimulationManager(object):
             simulation_parameters['above_roof'],
             receiver.indoor,
             simulation_parameters['seed_value1'],
-            simulation_parameters['iterations']
+            simulation_parameters['iterations'],
+            self.shadow_fading
         )
 
         return path_loss, model, strt_distance, type_of_sight
@@ -295,6 +503,12 @@ class SimulationManager(object):
         on distance, meaning we need to select sites 1-3 (as site 0
         is the actual site in use)
 
+        When 'max_interferers' is set in the simulation parameters only
+        that many of the closest interfering sites are evaluated, and the
+        averages are taken over them. As all interfering sites share the
+        same antenna, the closest sites are the strongest ones, so any
+        value of 3 or more leaves the SINR unchanged.
+
         Parameters
         ----------
         receiver : object
@@ -327,7 +541,12 @@ class SimulationManager(object):
         ave_distance = 0
         ave_pl = 0
 
-        for interfering_transmitter in self.interfering_transmitters.values():
+        interfering_transmitters = self.nearest_interferers(
+            receiver.coordinates,
+            simulation_parameters.get('max_interferers')
+        )
+
+        for interfering_transmitter in interfering_transmitters:
 
 
             temp_line = LineString(
@@ -365,6 +584,7 @@ class SimulationManager(object):
                 receiver.indoor,
                 simulation_parameters['seed_value2'],
                 simulation_parameters['iterations'],
+                self.shadow_fading
             )
 
             received_interference = self.estimate_received_power(
@@ -379,11 +599,11 @@ class SimulationManager(object):
             interference.append(received_interference)
 
         ave_distance = (
-            ave_distance / len(self.interfering_transmitters.values())
+            ave_distance / len(interfering_transmitters)
         )
 
         ave_pl = (
-            ave_pl / len(self.interfering_transmitters.values())
+            ave_pl / len(interfering_transmitters)
         )
 
         return interference, model, ave_distance, ave_pl
@@ -636,7 +856,265 @@ class SimulationManager(object):
         signaling_overhead_mbps = capacity_mbps * simulation_parameters['signaling_overhead']
 
         return signaling_overhead_mbps
-       
+
+
+    def _receiver_column(self, value, default, n):
+        """
+
+        Broadcast a receiver characteristic to one float per receiver.
+
+        """
+        if value is None:
+            value = default
+
+        return np.broadcast_to(np.asarray(value, dtype=float), (n,))
+
+
+    def _estimate_path_loss_batch(self, coordinates, frequency, environment,
+        simulation_parameters, ue_height, indoor):
+        """
+
+        Path loss between the transmitter and every receiver.
+
+        Returns
+        -------
+        path_loss : array
+            Path loss in decibels per receiver.
+        model : string
+            Specifies which propagation model was used.
+        strt_distance : array
+            Straight line distance in meters, floored at 20 m.
+        los : array of bool
+            True where the receiver is in line of sight.
+
+        """
+        dx = self.transmitter.coordinates[0] - coordinates[:, 0]
+        dy = self.transmitter.coordinates[1] - coordinates[:, 1]
+        strt_distance = np.maximum(np.sqrt(dx * dx + dy * dy), 20)
+
+        los = strt_distance < simulation_parameters['los_breakpoint_m']
+
+        path_loss, model = self._path_loss_batch(
+            frequency, strt_distance, self.transmitter, environment, los,
+            ue_height, indoor, simulation_parameters,
+            simulation_parameters['seed_value1']
+        )
+
+        return path_loss, model, strt_distance, los
+
+
+    def _estimate_received_power_batch(self, path_loss, gain, losses,
+        misc_losses):
+        """
+
+        Received power for arrays of path losses, see
+        `estimate_received_power`.
+
+        """
+        eirp = (
+            float(self.transmitter.power) +
+            float(self.transmitter.gain) -
+            float(self.transmitter.losses)
+        )
+
+        return eirp - path_loss - misc_losses + gain - losses
+
+
+    def _estimate_interference_batch(self, coordinates, frequency,
+        environment, simulation_parameters, ue_height, gain, losses,
+        misc_losses, indoor):
+        """
+
+        Interference from the interfering transmitters at every receiver,
+        limited to the closest 'max_interferers' when set.
+
+        Returns
+        -------
+        interference : array
+            (N, K) received interference power in decibels, for N receivers
+            and K interfering transmitters.
+        model : string
+            Specifies which propagation model was used.
+        ave_distance : array
+            Average distance in meters to the interfering transmitters.
+        ave_pl : array
+            Average path loss in decibels to the interfering transmitters.
+
+        """
+        distance = self.interferer_distance_matrix(coordinates)
+
+        max_interferers = simulation_parameters.get('max_interferers')
+        if max_interferers is not None and max_interferers < distance.shape[1]:
+            closest = np.argpartition(
+                distance, max_interferers - 1, axis=1)[:, :max_interferers]
+
+            # where more sites tie at the last kept distance than fit, keep
+            # the first ones in order, as a stable sort would
+            kth = np.take_along_axis(distance, closest, axis=1).max(axis=1)
+            tied = (distance <= kth[:, None]).sum(axis=1) > max_interferers
+            if tied.any():
+                closest[tied] = np.argsort(distance[tied], axis=1,
+                    kind='stable')[:, :max_interferers]
+
+            # sort the kept sites by distance, then position
+            order = np.lexsort(
+                (closest, np.take_along_axis(distance, closest, axis=1)))
+            closest = np.take_along_axis(closest, order, axis=1)
+            distance = np.take_along_axis(distance, closest, axis=1)
+
+        los = distance < simulation_parameters['los_breakpoint_m']
+
+        # interfering transmitters are built with the same antenna type, so
+        # a single kernel call covers all of them
+        interferer = next(iter(self.interfering_transmitters.values()))
+        path_loss, model = self._path_loss_batch(
+            frequency, distance, interferer, environment, los,
+            ue_height[:, None], indoor[:, None], simulation_parameters,
+            simulation_parameters['seed_value2']
+        )
+
+        interference = self._estimate_received_power_batch(
+            path_loss, gain[:, None], losses[:, None], misc_losses[:, None]
+        )
+
+        ave_distance = distance.sum(axis=1) / distance.shape[1]
+        ave_pl = path_loss.sum(axis=1) / distance.shape[1]
+
+        return interference, model, ave_distance, ave_pl
+
+
+    def interferer_distance_matrix(self, coordinates):
+        """
+
+        Straight line distances between receivers and interfering
+        transmitters.
+
+        Parameters
+        ----------
+        coordinates : array_like
+            (N, 2) array of receiver x and y coordinates.
+
+        Returns
+        -------
+        distance : array
+            (N, M) distances in meters, with interfering transmitters in
+            the order of self.interfering_transmitters.
+
+        """
+        coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+
+        dx = self.interferer_coordinates[None, :, 0] - coordinates[:, None, 0]
+        dy = self.interferer_coordinates[None, :, 1] - coordinates[:, None, 1]
+
+        return np.sqrt(dx * dx + dy * dy)
+
+
+    def nearest_interferers(self, coordinates, max_interferers=None):
+        """
+
+        Select the interfering transmitters closest to a receiver.
+
+        Parameters
+        ----------
+        coordinates : tuple
+            x and y coordinates of the receiver.
+        max_interferers : int
+            Number of interfering transmitters to return. All of them are
+            returned when None.
+
+        Returns
+        -------
+        interfering_transmitters : list of objects
+            Interfering transmitters, in the order of
+            self.interfering_transmitters when all are returned and by
+            distance otherwise.
+
+        """
+        interferers = list(self.interfering_transmitters.values())
+
+        if max_interferers is None or max_interferers >= len(interferers):
+            return interferers
+
+        x, y = coordinates[0], coordinates[1]
+
+        # rtree returns every site tied with the last one, so rank the
+        # candidates again to break ties by position
+        candidates = np.array(sorted(
+            self.interferer_index.nearest((x, y, x, y), max_interferers)))
+
+        dx = self.interferer_coordinates[candidates, 0] - x
+        dy = self.interferer_coordinates[candidates, 1] - y
+        distance = np.sqrt(dx * dx + dy * dy)
+
+        closest = candidates[np.argsort(distance, kind='stable')]
+
+        return [interferers[idx] for idx in closest[:max_interferers]]
+
+
+    def _path_loss_batch(self, frequency, distance, transmitter, environment,
+        los, ue_height, indoor, simulation_parameters, seed_value):
+        """
+
+        Path loss for an array of distances from one transmitter, and the
+        propagation model used.
+
+        """
+        return path_loss_calculator_batch(
+            frequency,
+            distance,
+            transmitter.ant_height,
+            transmitter.ant_type,
+            simulation_parameters['building_height'],
+            simulation_parameters['street_width'],
+            environment,
+            los,
+            ue_height,
+            simulation_parameters['above_roof'],
+            indoor,
+            seed_value,
+            simulation_parameters['iterations'],
+            self.shadow_fading
+        )
+
+
+    def _estimate_sinr_batch(self, received_power, interference, noise,
+        simulation_parameters):
+        """
+
+        SINR for arrays of received powers, see `estimate_sinr`. Only the
+        three strongest interferers of each receiver are summed.
+
+        Returns
+        -------
+        raw_sum_of_interference : array
+            Linear values of summed interference at each receiver.
+        i_plus_n : array
+            Linear sum of interference plus noise at each receiver.
+        sinr : array
+            Signal-to-Interference-plus-Noise-Ratio (SINR) in decibels.
+
+        """
+        raw_received_power = 10**received_power
+
+        interference = -np.sort(-(10**interference), axis=1)[:, :3]
+
+        i_summed = np.zeros(interference.shape[0])
+        for idx in range(interference.shape[1]):
+            i_summed = i_summed + interference[:, idx]
+
+        network_load = simulation_parameters['network_load']
+        raw_sum_of_interference = i_summed * (network_load/100)
+
+        raw_noise = 10**noise
+
+        i_plus_n = (raw_sum_of_interference + raw_noise)
+
+        sinr = np.round(np.log10(
+            raw_received_power / i_plus_n
+            ), 2)
+
+        return raw_sum_of_interference, i_plus_n, sinr
+
 
     def receiver_density(self):
         """
@@ -781,6 +1259,139 @@ class SiteArea(object):
         return area
 
 
+class ModulationCodingTable(object):
+    """
+
+    Compiled modulation and coding lookup table for one generation.
+
+    The pairwise scan of `estimate_spectral_efficiency` and
+    `estimate_modulation` is piecewise constant in the SINR, only changing
+    at the thresholds it compares against. These thresholds are stored as
+    sorted breakpoints together with the result of the scan on each
+    interval, so a lookup is a single binary search.
+
+    Parameters
+    ----------
+    modulation_and_coding_lut : list of tuples
+        A lookup table containing modulation and coding rates,
+        spectral efficiencies and SINR estimates.
+    generation : string
+        Either 4G or 5G dependent on technology.
+
+    """
+    def __init__(self, modulation_and_coding_lut, generation):
+        self.generation = generation
+
+        breakpoints = set()
+        highest_value = modulation_and_coding_lut[-1]
+        lowest_value = modulation_and_coding_lut[0]
+        for lower, upper in pairwise(modulation_and_coding_lut):
+            if lower[0] and upper[0] == generation:
+                breakpoints.update((lower[6], upper[6], highest_value[6],
+                    lowest_value[5]))
+
+        self.breakpoints = np.array(sorted(breakpoints), dtype=float)
+
+        # interval 0 lies below every breakpoint, interval i + 1 starts at
+        # breakpoint i
+        self.values = [self._scan(-np.inf, modulation_and_coding_lut)] + [
+            self._scan(value, modulation_and_coding_lut)
+            for value in self.breakpoints
+        ]
+
+        self.spectral_efficiency = np.array([
+            np.nan if value is None else value
+            for value, _ in self.values
+        ], dtype=float)
+        self.modulation = np.array([
+            modulation for _, modulation in self.values
+        ], dtype=object)
+
+
+    def _scan(self, sinr, modulation_and_coding_lut):
+        for lower, upper in pairwise(modulation_and_coding_lut):
+            if lower[0] and upper[0] == self.generation:
+
+                if sinr >= lower[6] and sinr < upper[6]:
+                    return lower[5], lower[3]
+
+                highest_value = modulation_and_coding_lut[-1]
+
+                if sinr >= highest_value[6]:
+                    return highest_value[5], highest_value[3]
+
+                lowest_value = modulation_and_coding_lut[0]
+
+                if sinr < lowest_value[5]:
+                    return 0, None
+
+        return None, None
+
+
+    def lookup(self, sinr):
+        """
+
+        Spectral efficiency and modulation for an array of SINR values.
+
+        Parameters
+        ----------
+        sinr : array
+            Signal-to-Interference-plus-Noise-Ratio (SINR) in decibels.
+
+        Returns
+        -------
+        spectral_efficiency : array
+            Efficiency of information transfer in Bps/Hz, NaN where the
+            lookup table gives no value.
+        modulation : array of objects
+            Estimated modulation, None where the lookup table gives no value.
+
+        """
+        sinr = np.asarray(sinr, dtype=float)
+        interval = np.searchsorted(self.breakpoints, sinr, side='right')
+
+        spectral_efficiency = self.spectral_efficiency[interval]
+        modulation = self.modulation[interval]
+
+        missing = np.isnan(sinr)
+        spectral_efficiency[missing] = np.nan
+        modulation[missing] = None
+
+        return spectral_efficiency, modulation
+
+
+    def lookup_value(self, sinr):
+        """
+
+        Spectral efficiency and modulation for a single SINR value,
+        returned exactly as `estimate_spectral_efficiency` and
+        `estimate_modulation` would.
+
+        """
+        if sinr != sinr:
+            return None, None
+
+        interval = bisect_right(self.breakpoints, sinr)
+
+        return self.values[interval]
+
+
+def modulation_and_coding_table(modulation_and_coding_lut, generation):
+    """
+
+    Return the compiled `ModulationCodingTable` for a lookup table and
+    generation, compiling it on first use.
+
+    """
+    return _compile_modulation_and_coding_table(
+        tuple(tuple(row) for row in modulation_and_coding_lut), generation)
+
+
+@lru_cache(maxsize=32)
+def _compile_modulation_and_coding_table(modulation_and_coding_lut, generation):
+    return ModulationCodingTable(modulation_and_coding_lut, generation)
+
+
 def pairwise(iterable):
     """
 
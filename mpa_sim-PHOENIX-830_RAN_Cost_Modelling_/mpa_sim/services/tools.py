@@ -9,6 +9,19 @@ import mpa_sim
 
 np.random.seed(42)
 
+# parameters each throughput depends on, used to invalidate cached results
+CELL_PARAMETERS = ('Modulation', 'Numerology', 'Bandwidth',
+    'number_of_aggregated_component_carriers', 'DL_MIMO_Layers',
+    'UL_MIMO_Layers', 'MU_MIMO', 'Rmax', 'Scaling_factor',
+    'signaling_overhead', 'DL_UP_ratio')
+
+ECPRI_PARAMETERS = ('Numerology', 'Bandwidth',
+    'Number_of_logical_antenna_ports', 'IQ_mantissa_bitwidth',
+    'IQ_exp_bitwidth', 'signaling_overhead')
+
+TRANSPORT_PARAMETERS = CELL_PARAMETERS + ECPRI_PARAMETERS + ('ru_du_ratio',
+    'du_cuup_ratio', 'cucp_cuup_ratio')
+
 
 class Calculator(object):
     """
@@ -32,13 +45,47 @@ class Calculator(object):
         (70,1):189, (80,1):217, (90,1):245, (100,1):273, (10,2):11, (15,2):18, (20,2):24,(25,2):31, (30,2):38, 
         (40,2):51, (50,2):65, (60,2):79, (70,2):93, (80,2):107, (90,2):121, (100,2):135}
 
+        # the nbr dict as a dense (bandwidth x numerology) array, for nbr_array
+        self._nbr_bandwidths = np.array(sorted(set(key[0] for key in self.nbr)), dtype=float)
+        self._nbr_numerologies = np.array(sorted(set(key[1] for key in self.nbr)), dtype=float)
+        self._nbr_table = np.full((len(self._nbr_bandwidths), len(self._nbr_numerologies)), np.nan)
+        for (bw, mu), value in self.nbr.items():
+            self._nbr_table[np.searchsorted(self._nbr_bandwidths, bw),
+                np.searchsorted(self._nbr_numerologies, mu)] = value
+
+        # cached results keyed by name, each with the parameter snapshot
+        # it was computed from
+        self._cache = {}
+
+    def _snapshot(self, keys):
+        return tuple(self.params.get(key) for key in keys)
 
-    def max_cell_throughput(self, mode = 'TDD') -> float:
+    def _cached(self, name, keys, compute):
+        """
+
+        Return the cached result of compute, recomputing it when any of the
+        parameters in keys changed since it was cached.
+
+        """
+        snapshot = self._snapshot(keys)
+        cached = self._cache.get(name)
+        if cached is not None and cached[0] == snapshot:
+            return cached[1]
+
+        result = compute()
+        self._cache[name] = (snapshot, result)
+        return result
+
+
+    def max_cell_throughput(self, mode = 'TDD') -> dict:
         """
 
         Сalculator to calculate the maximum throughput of 5G NR network for user (depending on his mobile device UE).
         Approximately data transfer rate of 5G NR can be calculated using the formula based on the 3GPP TS 38.306 standard.
 
+        The result is cached until any of the parameters it depends on
+        changes.
+
         Parameters
         ----------
             mode : string 
@@ -49,47 +96,69 @@ class Calculator(object):
         -------
             throughput : dict
                 a dictionary contains DL and UL throughput in Gbps {UL: float Gbps, DL: float Gbps}
-                
+
+        """
+        return dict(self._cached(('max_cell_throughput', mode), CELL_PARAMETERS,
+            lambda: self._scalar(self._max_cell_throughput(
+                self.params, self._params_nbr(), mode))))
+
+
+    def _params_nbr(self):
+        return self.nbr[(self.params['Bandwidth'], self.params['Numerology'])]
+
+
+    @staticmethod
+    def _scalar(throughput):
+        # the array capable helpers give numpy scalars for scalar params
+        if isinstance(throughput, dict):
+            return {key: float(value) for key, value in throughput.items()}
+        return float(throughput)
 
 
+    def _max_cell_throughput(self, params, nbr, mode = 'TDD') -> dict:
+        """
+
+        DL and UL throughput for params and a number of resource blocks
+        nbr, which may be scalars or numpy arrays broadcast together.
+
         """
 
         # ref: Energy Efficiency Gains in Interference-limitedHeterogeneous Cellular Mobile Radio Networkswith Random Micro Site Deployment
         # https://www.researchgate.net/publication/224242017_Energy_efficiency_gains_in_interference-limited_heterogeneous_cellular_mobile_radio_networks_with_random_micro_site_deployment
 
-        modulation_order = math.log2(self.params['Modulation'])
+        modulation_order = np.log2(params['Modulation'])
 
-        ts = (10**-3) / (14 * 2**self.params['Numerology'])
+        ts = (10**-3) / (14 * 2.0**params['Numerology'])
 
 
         dl = 10**-6 \
-            * self.params['number_of_aggregated_component_carriers'] \
-            * self.params['DL_MIMO_Layers'] \
-            * self.params['MU_MIMO'] \
+            * params['number_of_aggregated_component_carriers'] \
+            * params['DL_MIMO_Layers'] \
+            * params['MU_MIMO'] \
             * modulation_order \
-            * self.params['Rmax'] \
-            * self.params['Scaling_factor'] \
-            * self.nbr[(self.params['Bandwidth'], self.params['Numerology'])] \
+            * params['Rmax'] \
+            * params['Scaling_factor'] \
+            * nbr \
             * 12 \
-            * (1 - self.params['signaling_overhead']) \
+            * (1 - params['signaling_overhead']) \
             / ts
 
 
         ul = 10**-6 \
-            * self.params['number_of_aggregated_component_carriers'] \
-            * self.params['UL_MIMO_Layers'] \
-            * self.params['MU_MIMO'] \
+            * params['number_of_aggregated_component_carriers'] \
+            * params['UL_MIMO_Layers'] \
+            * params['MU_MIMO'] \
             * modulation_order \
-            * self.params['Rmax'] \
-            * self.params['Scaling_factor'] \
-            * self.nbr[(self.params['Bandwidth'], self.params['Numerology'])] \
+            * params['Rmax'] \
+            * params['Scaling_factor'] \
+            * nbr \
             * 12 \
-            * (1 - self.params['signaling_overhead']/1.75) \
+            * (1 - params['signaling_overhead']/1.75) \
             / ts
 
         if mode == 'TDD':
-            dl *= self.params['DL_UP_ratio'] 
-            ul *= (1 - self.params['DL_UP_ratio'])
+            dl = dl * params['DL_UP_ratio']
+            ul = ul * (1 - params['DL_UP_ratio'])
                
         return {'DL': dl/1000, 'UL': ul/1000}
 
@@ -100,6 +169,9 @@ class Calculator(object):
         Сalculator to calculate the FH throughput(eCPRI) of 5G NR network for user (depending on his mobile device UE).
         considering the IQ compression and signalling overhead
 
+        The result is cached until any of the parameters it depends on
+        changes.
+
         Parameters
         ----------
             mode : string 
@@ -111,23 +183,34 @@ class Calculator(object):
             throughput : float
                 throughput requires to be maintain at eCPRI
 
+        """
+        return self._cached('ecpri_throughput', ECPRI_PARAMETERS,
+            lambda: self._scalar(self._ecpri_throughput(
+                self.params, self._params_nbr())))
+
+    def _ecpri_throughput(self, params, nbr) -> float:
+        """
+
+        eCPRI throughput for params and a number of resource blocks nbr,
+        which may be scalars or numpy arrays broadcast together.
+
         """
 
         # symbole duration 
-        Symbol_duration = (10**-3) / (2**self.params['Numerology'])
+        Symbol_duration = (10**-3) / (2.0**params['Numerology'])
 
         symbols_in_slot = 14 # Maximum number of symbols in slot 5g
         num_subcarrier_per_RB = 12 # a resource block (RB) in NR is defined as 12 consecutive subcarriers
 
-        datarate = self.params['Number_of_logical_antenna_ports'] \
+        datarate = params['Number_of_logical_antenna_ports'] \
             * symbols_in_slot \
             / Symbol_duration \
-            * self.nbr[(self.params['Bandwidth'], self.params['Numerology'])] \
+            * nbr \
             * num_subcarrier_per_RB \
-            * (self.params['IQ_mantissa_bitwidth'] * 2 + self.params['IQ_exp_bitwidth']) \
+            * (params['IQ_mantissa_bitwidth'] * 2 + params['IQ_exp_bitwidth']) \
             / 10**9
 
-        throughput = datarate * (1+ self.params['signaling_overhead'])
+        throughput = datarate * (1+ params['signaling_overhead'])
 
         return throughput
         
@@ -273,4 +356,144 @@ class Calculator(object):
         
         return self.cucp_nb_traffic(mode)
 
- 
\ No newline at end of file
+    def throughputs(self, mode = 'TDD') -> dict:
+        """
+
+        Сalculator to derive the throughput of every interface in one pass.
+
+        Parameters
+        ----------
+            mode : string
+                Modulation mode [FDD (frequency division duplex) | TDD (time division duplex)].
+
+
+        Returns
+        -------
+            throughputs : dict
+                DL and UL cell throughput and the throughput of the eCPRI,
+                F1-C, F1-U, DU, CU-UP, CU-CP, core and SMO interfaces in
+                Gbps, with the same values as the individual methods.
+                Cached until any of the parameters they depend on changes.
+
+        """
+        return dict(self._cached(('throughputs', mode), TRANSPORT_PARAMETERS,
+            lambda: self._throughputs(mode)))
+
+    def _throughputs(self, mode = 'TDD') -> dict:
+
+        cell = self.max_cell_throughput(mode)
+        cell_tput = max(cell.values())
+
+        f1c = cell_tput * self.params['signaling_overhead'] * self.params['ru_du_ratio']
+        f1u = cell_tput * (1-self.params['signaling_overhead']) * self.params['ru_du_ratio']
+
+        cuup_nb = f1u * self.params['du_cuup_ratio']
+        cucp_nb = f1c * self.params['du_cuup_ratio'] * self.params['cucp_cuup_ratio']
+
+        return {
+            'DL': cell['DL'],
+            'UL': cell['UL'],
+            'ecpri': self.ecpri_throughput(),
+            'f1c': f1c,
+            'f1u': f1u,
+            'du_nb': f1c + f1u,
+            'cuup_nb': cuup_nb,
+            'cucp_nb': cucp_nb,
+            'core': cuup_nb * self.params['cucp_cuup_ratio'],
+            'smo': cucp_nb,
+        }
+
+    def nbr_array(self, bandwidth, numerology):
+        """
+
+        Vectorized lookup of the Max Transmission Bandwidth table.
+
+        Each (bandwidth, numerology) pair is looked up by binary search in
+        the dense (bandwidth x numerology) array built from the nbr dict.
+
+        Parameters
+        ----------
+            bandwidth : array_like
+                Bandwidth in MHz.
+            numerology : array_like
+                Numerology (µ).
+
+        Returns
+        -------
+            nbr : numpy.ndarray
+                Number of resource blocks, NaN where the nbr table has no
+                entry for the combination.
+
+        """
+        bandwidths = self._nbr_bandwidths
+        numerologies = self._nbr_numerologies
+        table = self._nbr_table
+
+        bandwidth, numerology = np.broadcast_arrays(
+            np.asarray(bandwidth, dtype=float), np.asarray(numerology, dtype=float))
+
+        row = np.clip(np.searchsorted(bandwidths, bandwidth), 0, len(bandwidths) - 1)
+        column = np.clip(np.searchsorted(numerologies, numerology), 0, len(numerologies) - 1)
+        valid = (bandwidths[row] == bandwidth) & (numerologies[column] == numerology)
+
+        return np.where(valid, table[row, column], np.nan)
+
+    def throughput_grid(self, mode = 'TDD', as_xarray = False, **axes):
+        """
+
+        Сalculator to evaluate the DL, UL and eCPRI throughput over a grid of
+        parameter values in one vectorized pass.
+
+        Parameters
+        ----------
+            mode : string
+                Modulation mode [FDD (frequency division duplex) | TDD (time division duplex)].
+            as_xarray : bool
+                Return an xarray Dataset instead of a DataFrame; requires xarray.
+            axes : array_like
+                Values of each parameter to vary, e.g. Numerology = [0, 1, 2].
+                Parameters without an axis are taken from params.
+
+        Returns
+        -------
+            throughput : pandas.DataFrame
+                DL, UL and eCPRI throughput in Gbps, indexed by every
+                combination of the axes. Combinations missing from the nbr
+                table are NaN.
+
+        """
+        unknown = set(axes) - set(CELL_PARAMETERS + ECPRI_PARAMETERS)
+        if unknown:
+            raise ValueError('Unknown throughput parameters: {}'.format(sorted(unknown)))
+
+        names = list(axes)
+        values = [np.asarray(axes[name]).ravel() for name in names]
+
+        params = dict(self.params)
+        params.update(zip(names, np.meshgrid(*values, indexing='ij')))
+
+        nbr = self.nbr_array(params['Bandwidth'], params['Numerology'])
+
+        cell = self._max_cell_throughput(params, nbr, mode)
+        ecpri = self._ecpri_throughput(params, nbr)
+
+        shape = tuple(len(value) for value in values)
+        results = {
+            'DL': np.broadcast_to(cell['DL'], shape),
+            'UL': np.broadcast_to(cell['UL'], shape),
+            'eCPRI': np.broadcast_to(ecpri, shape),
+        }
+
+        if as_xarray:
+            import xarray as xr
+            return xr.Dataset(
+                {key: (names, value) for key, value in results.items()},
+                coords=dict(zip(names, values)))
+
+        if not names:
+            return pd.DataFrame({key: [float(value)] for key, value in results.items()})
+
+        index = pd.MultiIndex.from_product(values, names=names)
+        return pd.DataFrame({key: value.ravel() for key, value in results.items()},
+            index=index)
+
@@ -0,0 +1,50 @@
+"""
+
+Benchmark of Hurestic_Dimensioning.network_acquisition on a synthetic
+OpenCelliD style cell table.
+
+Run with `python tests/bench_network_acquisition.py [rows]`, 10M rows by
+default.
+
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from mpa_sim.services.hurestic_dimentioning import Hurestic_Dimensioning
+
+
+def generate_cells(rows, mncs=300, lacs=2000, seed=42):
+    """
+
+    Synthetic cell table with the OpenCelliD columns used by the dimensioning.
+
+    """
+    random_state = np.random.RandomState(seed)
+
+    return pd.DataFrame({
+        'MCC': np.full(rows, 262, dtype=np.int32),
+        'MNC': random_state.randint(1, mncs + 1, rows).astype(np.int32),
+        'LAC': random_state.randint(1, lacs + 1, rows).astype(np.int32),
+        'CID': np.arange(rows, dtype=np.int64),
+        'range': random_state.randint(1, 10000, rows).astype(np.int32),
+        'samples': random_state.geometric(0.01, rows).astype(np.int32),
+    })
+
+
+def main(rows=10000000):
+    df = generate_cells(rows)
+    model = Hurestic_Dimensioning(None, {}, 1)
+
+    start = time.perf_counter()
+    result = model.network_acquisition(df, 10, 500)
+    elapsed = time.perf_counter() - start
+
+    print('network_acquisition: {} rows -> {} rows in {:.2f} s'.format(
+        rows, len(result), elapsed))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,63 @@
+import numpy as np
+
+from mpa_sim.services.costs import ComponentCatalog
+
+
+def scan(items, **kwargs):
+    matching = [
+        item for item in items
+        if all(item[key] >= value for key, value in kwargs.items())
+    ]
+    if not matching:
+        return items[-1]
+    return min(matching, key=lambda item: item['price'])
+
+
+def test_component_catalog():
+    rng = np.random.RandomState(0)
+    items = [
+        {
+            'model': str(idx),
+            'price': int(price),
+            'speed': int(speed),
+            'distance': int(distance),
+        }
+        for idx, (price, speed, distance) in enumerate(zip(
+            rng.randint(100, 120, 2000), rng.randint(1, 100, 2000),
+            rng.randint(100, 40000, 2000)))
+    ]
+    catalog = ComponentCatalog(items)
+    small = ComponentCatalog(items, min_vectorized=len(items) + 1)
+
+    for speed, distance in zip(rng.uniform(0, 110, 200),
+        rng.uniform(0, 45000, 200)):
+        expected = scan(items, speed=speed, distance=distance)
+        assert catalog.select(speed=speed, distance=distance) is expected
+        assert small.select(speed=speed, distance=distance) is expected
+
+    assert catalog.select(speed=1000) is items[-1]
+    assert catalog.select() is scan(items)
+    assert len(catalog._queries) == 202
+
+
+def test_component_catalog_missing_attribute():
+    items = [{'price': 10}] * 20 + [{'price': 5, 'ports': 4}]
+    catalog = ComponentCatalog(items)
+
+    assert catalog.select() is items[-1]
+    assert catalog._attribute('ports') is None
+
+
+def test_component_catalog_indices():
+    rng = np.random.RandomState(1)
+    items = [
+        {'price': int(price), 'speed': int(speed)}
+        for price, speed in zip(rng.randint(1, 50, 40), rng.randint(1, 100, 40))
+    ]
+    speeds = rng.uniform(0, 120, 500)
+
+    for catalog in (ComponentCatalog(items),
+        ComponentCatalog(items + [{'price': 1, 'speed': True}])):
+        res = catalog.indices(speed=speeds)
+        assert [catalog.items[idx] for idx in res] == [
+            scan(catalog.items, speed=speed) for speed in speeds]
@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+
+from mpa_sim.services import costs
+from mpa_sim.services.costs import Cost
+
+
+PARAMETERS = {
+    'asset_lifetime': 10,
+    'discount_rate': 3.5,
+    'opex_percentage_of_capex': 10,
+    'sectorization': 3,
+    'ru_du_ratio': 10,
+    'du_cuup_ratio': 1,
+    'signaling_overhead': 0.18,
+    'type_of_server': 'Dell PowerEdge T330 server',
+    'type_of_virtualization': 'KVM',
+    'prop_or_not': True,
+    'n_virtual_machines': 4,
+}
+
+LEASE_LINES = [
+    {'model': '1Gbps', 'price': 1000, 'speed': 1},
+    {'model': '10Gbps', 'price': 2000, 'speed': 10},
+    {'model': '100Gbps', 'price': 10000, 'speed': 100},
+]
+
+COSTS = {
+    'cpu': [{'model': '6148', 'price': 2988.39, 'cores': 20, 'power': 150}],
+    'server': [{'model': 'XR11', 'price': 900, 'cpu_max': 2}],
+    'switch': [
+        {'model': '10GB Fiber', 'price': 2000, 'ports': 8, 'speed': 10},
+        {'model': '25GB Fiber', 'price': 8000, 'ports': 8, 'speed': 25},
+    ],
+    'lease_line_installation': LEASE_LINES,
+    'lease_line_installation_per_meter': [
+        dict(item, price=item['price'] / 10000) for item in LEASE_LINES],
+    'lease_line_rental': [
+        dict(item, price=item['price'] / 2) for item in LEASE_LINES],
+    'sfp': [
+        {'model': 'QSPF28', 'price': 599, 'distance': 10000, 'speed': 100},
+        {'model': 'SPF28', 'price': 420, 'distance': 30000, 'speed': 25},
+        {'model': 'Dell SPF', 'price': 115, 'distance': 300, 'speed': 10},
+    ],
+    'single_sector_antenna': [{'price': 1500}],
+    'ru': [{'price': 4000}],
+    'tower': [{'price': 10000}],
+    'transportation': [{'price': 10000}],
+    'installation': [{'price': 5000}],
+    'site_rental': [{'price': 8000}],
+    'power_generator_battery_system': [{'price': 5000}],
+    'l1_controller': [{'model': 'marvell', 'price': 900, 'ports': 4}],
+}
+
+
+def test_get_cost_batch(monkeypatch):
+    monkeypatch.setattr(costs, 'overhead_per_server', lambda *args: 7.5)
+    monkeypatch.setattr(costs.Calculator, 'ecpri_throughput', lambda self: 24.0)
+    fm = Cost(simulation_parameters=PARAMETERS, cost_parameters=COSTS)
+
+    rng = np.random.RandomState(0)
+    sites_per_km2 = rng.uniform(1, 50, 50)
+    capacity_gbps = rng.uniform(0.1, 40, 50)
+    rudu_distance = rng.uniform(10, 40000, 50)
+    utils = rng.uniform(1, 300, (3, 50))
+
+    res = fm.get_cost_batch(sites_per_km2, capacity_gbps, rudu_distance,
+        10000, *utils)
+
+    assert len(res) == 50
+    for idx in range(50):
+        expected = fm.get_cost(sites_per_km2[idx], capacity_gbps[idx],
+            rudu_distance[idx], 10000, *utils[:, idx])
+        for breakdown, values in expected.items():
+            for key, value in values.items():
+                assert res[(breakdown, key)].iloc[idx] == pytest.approx(value)
+
+
+def test_serv_cost_cache(monkeypatch):
+    calls = []
+    monkeypatch.setattr(costs, 'overhead_per_server',
+        lambda *args: calls.append(args) or 7.5)
+    fm = Cost(simulation_parameters=PARAMETERS, cost_parameters=COSTS)
+
+    plan = fm.serv_cost(50)
+    assert len(calls) == 1
+
+    # a repeated utilization is served from the cache, not recomputed
+    assert fm.serv_cost(50) == plan
+    assert len(calls) == 1
+
+    # the cached plan is a copy, so callers can not change it
+    plan['cpu_price'] = 0
+    assert fm.serv_cost(50)['cpu_price'] > 0
+
+    fm.serv_cost(50, max_utilization=90)
+    assert len(calls) == 2
+
+
+def test_serv_cost_cache_eviction(monkeypatch):
+    monkeypatch.setattr(costs, 'overhead_per_server', lambda *args: 7.5)
+    fm = Cost(simulation_parameters=PARAMETERS, cost_parameters=COSTS)
+    fm._max_server_plans = 2
+
+    fm.serv_cost(10)
+    fm.serv_cost(20)
+    fm.serv_cost(10)
+    fm.serv_cost(30)
+
+    # 20 is the least recently used plan once 10 is served again
+    assert len(fm._server_plans) == 2
+    assert [key[0] for key in fm._server_plans] == [10, 30]
+
+
+def test_get_cost_with_server_plan_cache(monkeypatch):
+    monkeypatch.setattr(costs, 'overhead_per_server', lambda *args: 7.5)
+    monkeypatch.setattr(costs.Calculator, 'ecpri_throughput', lambda self: 24.0)
+    fm = Cost(simulation_parameters=PARAMETERS, cost_parameters=COSTS)
+    uncached = Cost(simulation_parameters=PARAMETERS, cost_parameters=COSTS)
+    uncached._max_server_plans = 0
+
+    args = [(12.5, 6, 15000, 10000, 50, 100, 150),
+            (3.0, 20, 500, 10000, 50, 150, 100),
+            (12.5, 6, 15000, 10000, 50, 100, 150)]
+
+    for arg in args:
+        expected = uncached.get_cost(*arg)
+        assert not uncached._server_plans
+        assert fm.get_cost(*arg) == expected
+
+    assert len(fm._server_plans) == 3
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from mpa_sim.services.costs import Cost, annuity_factor
+
+
+def discount_loop(cost, capex, asset_lifetime, discount_rate, opex_percentage):
+    opex = round(cost * opex_percentage / 100) if capex else cost
+    total_cost_of_ownership = cost if capex else 0
+    for i in range(0, asset_lifetime):
+        total_cost_of_ownership += opex / (1 + discount_rate / 100) ** i
+    return total_cost_of_ownership
+
+
+@pytest.mark.parametrize('asset_lifetime, discount_rate', [
+    (10, 3.5),
+    (1, 3.5),
+    (25, 8),
+    (10, 0),
+])
+def test_discount_ownership_cost(asset_lifetime, discount_rate):
+    fm = Cost(simulation_parameters={
+        'asset_lifetime': asset_lifetime,
+        'discount_rate': discount_rate,
+        'opex_percentage_of_capex': 10,
+    }, cost_parameters={})
+    costs = [1000, 1234.5, 25, 0]
+
+    for cost in costs:
+        for capex in (True, False):
+            assert fm.discount_ownership_cost(cost, capex) == pytest.approx(
+                discount_loop(cost, capex, asset_lifetime, discount_rate, 10))
+
+    res = fm.discount_ownership_costs(costs * 2, [True] * 4 + [False] * 4)
+    assert res == pytest.approx([
+        fm.discount_ownership_cost(cost, capex)
+        for capex in (True, False) for cost in costs
+    ])
+
+
+def test_annuity_factor():
+    assert annuity_factor(10, 0.035) == pytest.approx(8.6074, 1e-4)
+    assert annuity_factor(10, 0) == 10
+    assert annuity_factor(0, 0.035) == 0
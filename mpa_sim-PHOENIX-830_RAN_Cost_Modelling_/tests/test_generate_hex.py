@@ -0,0 +1,60 @@
+import numpy as np
+
+from mpa_sim.services.generate_hex import (generate_site_areas,
+    find_site_locations, GeometryCache, get_transformer,
+    convert_point_to_projected_crs, convert_points_to_projected_crs)
+
+from tests.test_system_simulator import POINT
+
+
+def test_geometry_cache(monkeypatch):
+    cache = GeometryCache(maxsize=2)
+
+    site_area, interfering_site_areas = generate_site_areas(POINT, 500)
+    transmitter, interfering_transmitters = find_site_locations(
+        site_area, interfering_site_areas)
+
+    res = cache.sites_and_site_areas(POINT, 500)
+    assert res[0] == transmitter
+    assert res[1] == interfering_transmitters
+    assert res[2][0]['geometry'] == site_area[0]['geometry']
+
+    # a cached layout is returned as a copy without regenerating it
+    res[0][0]['properties']['site_id'] = 'changed'
+    monkeypatch.setattr('mpa_sim.services.generate_hex.generate_site_areas',
+        None)
+    assert cache.sites_and_site_areas(POINT, 500)[0] == transmitter
+
+    monkeypatch.undo()
+    cache.sites_and_site_areas(POINT, 1000)
+    cache.sites_and_site_areas(POINT, 2000)
+    assert len(cache) == 2
+    assert (500, ) + POINT['geometry']['coordinates'] not in cache._layouts
+
+
+def test_geometry_cache_dir(tmpdir, monkeypatch):
+    expected = GeometryCache(cache_dir=str(tmpdir)).sites_and_site_areas(
+        POINT, 500)
+
+    monkeypatch.setattr('mpa_sim.services.generate_hex.generate_site_areas',
+        None)
+    res = GeometryCache(cache_dir=str(tmpdir)).sites_and_site_areas(POINT, 500)
+
+    assert res[0] == expected[0]
+    assert res[1] == expected[1]
+    assert len(tmpdir.listdir()) == 1
+
+
+def test_convert_points_to_projected_crs():
+    points = [(37.39, -121.97), (51.5, -0.12), (-33.9, 151.2)]
+
+    res = convert_points_to_projected_crs(points, 'epsg:4326', 'epsg:3857')
+
+    assert get_transformer('epsg:4326', 'epsg:3857') is get_transformer(
+        'epsg:4326', 'epsg:3857')
+    assert res.shape == (3, 2)
+    for point, coordinates in zip(points, res):
+        expected = convert_point_to_projected_crs(point, 'epsg:4326',
+            'epsg:3857')['geometry']['coordinates']
+        np.testing.assert_allclose(coordinates, expected)
+    np.testing.assert_allclose(res[0], (-13577638.292, 4493608.075))
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from mpa_sim.services.generate_hex import generate_site_areas
+from mpa_sim.services.hex_lattice import (HexLattice,
+    generate_lattice_site_areas)
+
+from tests.test_system_simulator import POINT
+
+
+def site_ids(site_areas):
+    return sorted(site['properties']['site_id'] for site in site_areas)
+
+
+POINTS = [POINT] + [
+    {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': (x, y)},
+        'properties': {},
+    }
+    for x, y in np.random.RandomState(1).uniform(-1e6, 1e6, (5, 2))
+]
+
+
+def tied_cells(lattice, x, y):
+    """
+
+    Hexagons whose centres are closest to the point, the candidates the
+    rtree search of generate_site_areas can return.
+
+    """
+    row, column = lattice.locate(x, y)
+    cells = [(row, column)] + lattice.ring(row, column, 1)
+    distances = np.array([np.hypot(*np.subtract(lattice.centre(*cell), (x, y)))
+        for cell in cells])
+
+    return [cell for cell, distance in zip(cells, distances)
+        if distance - distances.min() <= 1e-9 * lattice.side_length]
+
+
+@pytest.mark.parametrize('site_radius', [100, 500, 2000])
+@pytest.mark.parametrize('point', POINTS)
+def test_generate_lattice_site_areas(point, site_radius):
+    site_area, interfering_site_areas = generate_site_areas(point, site_radius)
+    res, res_interfering = generate_lattice_site_areas(point, site_radius)
+
+    x, y = point['geometry']['coordinates']
+    lattice = HexLattice(x, y, site_radius)
+    ties = tied_cells(lattice, x, y)
+
+    # the point lies on an edge shared by two hexagons, which the rtree
+    # search of generate_site_areas resolves either way, the lattice takes
+    # the lowest site id
+    assert len(ties) == 2
+    assert res[0]['properties']['site_id'] == min(
+        lattice.site_id(*cell) for cell in ties)
+
+    # whichever tied hexagon generate_site_areas served, the lattice gives
+    # the same site area and interferers around it
+    legacy = site_area[0]['properties']['site_id']
+    cell = [cell for cell in ties if lattice.site_id(*cell) == legacy]
+    assert len(cell) == 1
+
+    expected = lattice.site_area(*cell[0])
+    assert np.allclose(expected['geometry']['coordinates'][0],
+        site_area[0]['geometry']['coordinates'][0])
+    assert site_ids(lattice.site_area(*ring_cell)
+        for ring_cell in lattice.ring(*cell[0], 1)) == \
+        site_ids(interfering_site_areas)
+
+
+def test_generate_lattice_site_areas_tiers():
+    res, res_interfering = generate_lattice_site_areas(POINT, 500, tiers=2)
+    centre = np.array(res[0]['centroid'].coords[0])
+
+    distances = [np.hypot(*(site['centroid'].coords[0] - centre))
+        for site in res_interfering]
+
+    assert len(set(site_ids(res + res_interfering))) == 19
+    assert distances[:6] == pytest.approx([1000] * 6)
+    assert max(distances[6:]) == pytest.approx(2000)
+
+    with pytest.raises(ValueError):
+        generate_lattice_site_areas(POINT, 500, tiers=0)
@@ -0,0 +1,356 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mpa_sim.services.hurestic_dimentioning import Hurestic_Dimensioning
+
+
+PARAMETERS = {
+    'Rmax': 948 / 1024,
+    'Scaling_factor': 1,
+}
+
+
+def expected_capacity(model, W_x_thr, zeta, mu, p):
+    r_x = model.transit_df['r_x'].values[mu]
+    W_x_max = math.floor(model.transmission_model(mu, OH=0.08) / r_x)
+
+    result = 0
+    for W_x_k in range(W_x_max, W_x_thr + 1):
+        prob = sum(math.comb(W_x_k, k) * p**k * (1 - p)**(W_x_k - k)
+            for k in range(0, W_x_max + 1))
+        if prob >= zeta:
+            result = W_x_k
+
+    return result
+
+
+@pytest.mark.parametrize('W_x_thr, zeta, mu, p2, p3', [
+    (50, 0.9, 0, 0.05, 0.05),
+    (200, 0.5, 1, 0.2, 0.1),
+    (400, 0.99, 2, 0.05, 0.05),
+    (5, 0.9, 1, 0.2, 0.1),
+])
+def test_capacity_model(W_x_thr, zeta, mu, p2, p3):
+    model = Hurestic_Dimensioning(None, PARAMETERS, 1)
+
+    assert model.capacity_model(W_x_thr, zeta, mu, p2, p3) == \
+        expected_capacity(model, W_x_thr, zeta, mu, p2 + p3)
+
+
+def test_capacity_model_large_threshold():
+    model = Hurestic_Dimensioning(None, PARAMETERS, 1)
+
+    result = model.capacity_model(10**6, 0.9, 1, 0.01, 0.02)
+
+    assert 0 < result < 10**6
+
+
+def test_transmission_rates():
+    model = Hurestic_Dimensioning(None, PARAMETERS, 1)
+    transit_df = model.transit_df
+
+    rates = model.transmission_rates(0.08)
+
+    assert model.transmission_rates(0.08) is rates
+    for mu in transit_df['mu']:
+        row = transit_df[transit_df['mu'] == mu].iloc[0]
+        V = row['v_layers'] * row['Qm'] * PARAMETERS['Scaling_factor'] * \
+            PARAMETERS['Rmax']
+        t_s_mu = 10**-3 / (14 * (2**mu))
+        expected = 10**-6 * V * row['Nrb'] * 12 / t_s_mu * (1 - 0.08)
+        assert model.transmission_model(mu, 0.08) == pytest.approx(expected)
+        assert model.numerology['r_x'][mu] == row['r_x']
+
+
+def test_coverage_grid():
+    model = Hurestic_Dimensioning(None, PARAMETERS, 1)
+    fitered_data = pd.DataFrame({
+        'MNC': [260, 260, 410, 410, 10],
+        'samples': [12, 40, 75, 150, 399],
+    })
+
+    R_cov, E_x_cet_range = model.coverage_grid(fitered_data, range(11),
+        [0, 1, 2])
+
+    assert R_cov.shape == E_x_cet_range.shape == (3, 11, 5)
+    d_bp = (4 * math.pi * 10 * 12.5) / ((30 * 10**9) / 299792458)
+    Nrb = model.transit_df['Nrb']
+    for mu in range(3):
+        for p_tx in range(11):
+            E_x = p_tx - 10 * math.log10(Nrb[mu] / Nrb.sum()) - \
+                10 * math.log10(Nrb[mu] * 12)
+            for idx, (mnc, samples) in enumerate(zip(fitered_data['MNC'],
+                fitered_data['samples'])):
+                E_x_cet = E_x + 10 * math.log10(Nrb[mu] / (.95 * samples) * 12)
+                expected = 10 ** ((E_x_cet - (32.4 + 20 * math.log10(mnc) -
+                    9.5 * math.log10(d_bp**2 + 2.5**2) + 5)) / 40)
+                assert E_x_cet_range[mu, p_tx, idx] == pytest.approx(E_x_cet)
+                assert R_cov[mu, p_tx, idx] == pytest.approx(expected)
+
+    res = model.coverage_computation(fitered_data, 4, 1)
+    assert res[0] == pytest.approx(R_cov[1, 4].tolist())
+    assert res[1] == pytest.approx(E_x_cet_range[1, 4].tolist())
+
+
+def test_network_acquisition():
+    model = Hurestic_Dimensioning(None, PARAMETERS, 1)
+    df = pd.DataFrame({
+        'MNC': [2, 1, 2, 1, 1, 2, 3, 1, 2, 2],
+        'LAC': [7, 6, 8, 6, 5, 7, 9, 5, 8, 8],
+        'CID': range(10),
+        'samples': [40, 20, 1000, 30, 35, 35, 5, 15, 10, 45],
+    }, index=range(100, 110))
+
+    res = model.network_acquisition(df, 5, 100)
+
+    # MNC 2 first, where LAC 8 only has 55 samples in range, then MNC 1
+    # with LAC 5 and 6 tied, and MNC 3 without rows in range
+    assert res.index.tolist() == [100, 105, 104, 107]
+    assert res['LAC'].tolist() == [7, 7, 5, 5]
+    assert res.columns.tolist() == df.columns.tolist()
+    assert model.network_acquisition(df, 1000, 2000).empty
+
+
+def write_cells(path):
+    pd.DataFrame({
+        'radio': ['LTE', 'GSM', 'LTE', 'UMTS', 'LTE'],
+        'MCC': [262, 262, 208, 262, 262],
+        'MNC': [1, 2, 1, 1, 3],
+        'LAC': [10, 20, 30, 10, 40],
+        'CID': [100, 200, 300, 400, 500],
+        'lon': [13.4, 13.5, 2.3, 13.3, 13.2],
+        'range': [1000, 2000, 1500, 500, 800],
+        'samples': [12, 40, 7, 3, 25],
+    }).to_csv(path, index=False)
+
+
+def test_load_cells(tmp_path):
+    path = str(tmp_path / 'cells.csv')
+    write_cells(path)
+    model = Hurestic_Dimensioning(path, PARAMETERS, 1)
+
+    res = model.load_cells(mcc=262, mnc=[1, 3], chunksize=2, cache=False)
+
+    assert res.columns.tolist() == ['MNC', 'LAC', 'CID', 'range', 'samples']
+    assert res['CID'].tolist() == [100, 400, 500]
+    assert res['samples'].dtype == np.int32
+    assert len(model.load_cells(cache=False)) == 5
+    assert not os.path.exists(str(tmp_path / 'cells.cells.parquet'))
+
+
+def test_load_cells_cache(tmp_path, monkeypatch):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / 'cells.csv')
+    write_cells(path)
+    model = Hurestic_Dimensioning(path, PARAMETERS, 1)
+
+    expected = model.load_cells(mnc=1)
+    assert os.path.exists(str(tmp_path / 'cells.cells.parquet'))
+
+    with monkeypatch.context() as m:
+        m.setattr(pd, 'read_csv', None)
+        pd.testing.assert_frame_equal(model.load_cells(mnc=1), expected)
+
+    # other filters or a changed csv parse the csv again
+    assert len(model.load_cells(mnc=2)) == 1
+    pd.DataFrame({'MCC': [262], 'MNC': [1], 'LAC': [1], 'CID': [1],
+        'range': [1], 'samples': [1]}).to_csv(path, index=False)
+    os.utime(path, ns=(0, 0))
+    assert model.load_cells(mnc=1)['CID'].tolist() == [1]
+
+
+def test_cluster_cells(tmp_path, monkeypatch):
+    from sklearn.cluster import KMeans
+
+    from mpa_sim.services import hurestic_dimentioning
+
+    rng = np.random.RandomState(0)
+    df = pd.DataFrame({
+        'range': np.concatenate([rng.randint(100, 200, 50),
+            rng.randint(5000, 6000, 50)]),
+        'samples': rng.randint(1, 300, 100),
+    })
+    model = Hurestic_Dimensioning(str(tmp_path / 'cells.csv'), PARAMETERS, 1)
+
+    kmeans, labels = model.cluster_cells(df, 2)
+
+    expected = KMeans(n_clusters=2, random_state=0).fit(df)
+    assert (labels == expected.labels_).all()
+    assert os.path.exists(str(tmp_path / 'cells.clusters.pkl'))
+
+    # the saved clustering is used for the same data, without fitting
+    with monkeypatch.context() as m:
+        m.setattr(hurestic_dimentioning, 'KMeans', None)
+        assert (model.cluster_cells(df, 2)[1] == labels).all()
+
+    monkeypatch.setattr(hurestic_dimentioning, 'MINIBATCH_MIN_SAMPLES', 10)
+    kmeans, labels = model.cluster_cells(df.iloc[::-1], 2)
+    assert type(kmeans).__name__ == 'MiniBatchKMeans'
+    assert len(set(labels[:50])) == len(set(labels[50:])) == 1
+    assert labels[0] != labels[-1]
+
+
+def test_load_cells_cache_dir(tmp_path, monkeypatch):
+    pytest.importorskip('pyarrow')
+    from mpa_sim.services import hurestic_dimentioning
+
+    path = str(tmp_path / 'cells.csv')
+    write_cells(path)
+    model = Hurestic_Dimensioning(path, PARAMETERS, 1)
+
+    expected = model.load_cells(cache=False)
+    cache_dir = str(tmp_path / 'cache')
+    pd.testing.assert_frame_equal(model.load_cells(cache_dir=cache_dir),
+        expected)
+    assert os.listdir(cache_dir) == ['cells.cells.parquet']
+    assert not os.path.exists(str(tmp_path / 'cells.cells.parquet'))
+
+    # a cache that cannot be written is skipped, leaving no partial file
+    def write_table(table, where):
+        open(where, 'w').close()
+        raise PermissionError(where)
+
+    monkeypatch.setattr(hurestic_dimentioning.pq, 'write_table', write_table)
+    pd.testing.assert_frame_equal(model.load_cells(), expected)
+    assert sorted(os.listdir(str(tmp_path))) == ['cache', 'cells.csv']
+
+    # so is a cache_dir that cannot be created
+    pd.testing.assert_frame_equal(model.load_cells(cache_dir=path), expected)
+
+
+def test_cluster_cells_stale_cache(tmp_path, monkeypatch):
+    from mpa_sim.services import hurestic_dimentioning
+
+    rng = np.random.RandomState(0)
+    df = pd.DataFrame({
+        'range': rng.randint(100, 6000, 100),
+        'samples': rng.randint(1, 300, 100),
+    })
+    model = Hurestic_Dimensioning(str(tmp_path / 'cells.csv'), PARAMETERS, 1)
+    cache_path = str(tmp_path / 'cells.clusters.pkl')
+
+    labels = model.cluster_cells(df, 2)[1]
+
+    # a clustering saved by another sklearn version is fitted again
+    monkeypatch.setattr(hurestic_dimentioning.sklearn, '__version__', '0.0')
+    os.utime(cache_path, (0, 0))
+    assert (model.cluster_cells(df, 2)[1] == labels).all()
+    assert os.path.getmtime(cache_path) != 0
+
+    # as is one that cannot be unpickled
+    with open(cache_path, 'wb') as f:
+        f.write(b'not a pickle')
+    assert (model.cluster_cells(df, 2)[1] == labels).all()
+
+    cache_dir = str(tmp_path / 'cache')
+    model.cluster_cells(df, 2, cache_dir=cache_dir)
+    assert os.listdir(cache_dir) == ['cells.clusters.pkl']
+
+
+def test_calculate_results_without_cache(tmp_path):
+    path = str(tmp_path / 'cells.csv')
+    rng = np.random.RandomState(0)
+    pd.DataFrame({
+        'MCC': 262,
+        'MNC': rng.choice([1, 2, 3, 7], 400),
+        'LAC': rng.randint(1, 20, 400),
+        'CID': np.arange(400),
+        'range': rng.randint(1, 5000, 400),
+        'samples': rng.randint(1, 300, 400),
+    }).to_csv(path, index=False)
+    parameters = dict(PARAMETERS, a=5, b=250, W_x_thr=100, zeta=0.9, p2=0.1,
+        p3=0.1, approx_range_of_cell=1000, cell_load=20, cache=False)
+
+    res = Hurestic_Dimensioning(path, parameters, 10).calculate_results()
+
+    assert len(res) == 3
+    assert os.listdir(str(tmp_path)) == ['cells.csv']
+
+
+def legacy_net_dimensioning(model, Agm, m_list, δcov, phim, m_data):
+    """
+
+    The NetDimensioning loop as it was before it was vectorized.
+
+    """
+    parameters = model.simulation_parameters
+    fitered_data = model.network_acquisition(m_data, parameters['a'],
+        parameters['b'])
+    β = 3 * sum(model.capacity_model(parameters['W_x_thr'],
+        parameters['zeta'], mu, parameters['p2'], parameters['p3'])
+        for mu in [0, 1, 2])
+
+    results = []
+    R_x_cov = [0] * 1000
+    for m_idx in m_list:
+        for x_idx in [1, 2, 3]:
+            for Ptx_variable in range(0, 10 + 1):
+                Ecet, r_cov = model.coverage_computation(fitered_data,
+                    Ptx_variable, x_idx - 1)
+                Ecet_x = Ecet[x_idx]
+                R_x_cov[m_idx] = r_cov[x_idx]
+        k = R_x_cov.index(min(R_x_cov))
+        Rcov = R_x_cov[k]
+        Zcov = [math.inf] * 100
+        Zcap = [math.inf] * 100
+        for δcap in range(1, 100 + 1):
+            Ac = β * δcap / phim[m_idx]
+            Rcap = (Ac / Agm)**0.5
+            diff_R = abs(Rcov - Rcap)
+            diff_L = abs(δcov - δcap)
+            try:
+                if diff_L <= 1 and diff_R <= 10:
+                    Zcov[δcap] = Agm / (1.95 * Rcov**2)
+                    Zcap[δcap] = Agm / Ac
+            except:
+                pass
+        z = min(enumerate(zip(Zcov, Zcap)), key=lambda x: x[1])[0]
+        Ptx = list(range(0, 10 + 1))
+        results.append((Zcov[z], Zcap[z], Ptx[z]))
+
+    return results
+
+
+@pytest.mark.parametrize('W_x_thr, δcov, samples, outcome', [
+    # finite Zcov and Zcap around δcap = 5
+    (30, 5, 350, 'finite'),
+    # β = 0, so Zcov is set but Zcap stays infinite
+    (0, 5, 350, 'finite'),
+    # only δcap = 100 is within the cell load, which falls outside Zcov
+    (30, 101, 350, 'infinite'),
+    # the chosen δcap is beyond the 11 transmit powers
+    (30, 99, 350, IndexError),
+    # a coverage range of 0, where Zcov is never set
+    (30, 5, 20, 'infinite'),
+])
+def test_net_dimensioning(W_x_thr, δcov, samples, outcome):
+    parameters = dict(PARAMETERS, a=1, b=1000, W_x_thr=W_x_thr, zeta=0.9,
+        p2=0.1, p3=0.1)
+    model = Hurestic_Dimensioning(None, parameters, 1)
+    m_data = pd.DataFrame({
+        'MNC': [1, 1, 2, 2, 3, 3],
+        'LAC': [1, 1, 1, 1, 1, 1],
+        'CID': range(6),
+        'samples': np.array([0, -30, 30, -20, 10, -10]) + samples,
+    })
+    arguments = (1e4, [1, 2, 3], δcov, {1: 1.0, 2: 2.0, 3: 4.0}, m_data)
+
+    if outcome is IndexError:
+        with pytest.raises(IndexError):
+            legacy_net_dimensioning(model, *arguments)
+        with pytest.raises(IndexError):
+            model.NetDimensioning(*arguments[:4], None, m_data)
+        return
+
+    expected = legacy_net_dimensioning(model, *arguments)
+    res = model.NetDimensioning(*arguments[:4], None, m_data)
+
+    assert all(math.isfinite(row[0]) == (outcome == 'finite')
+        for row in expected)
+    assert len(res) == len(expected)
+    for row, expected_row in zip(res, expected):
+        assert row == pytest.approx(expected_row)
@@ -1,6 +1,11 @@
+import os
+import shutil
 import sys
 
-from mpa_sim.services.hw_estimator import CPU_forecasting_model
+import pytest
+
+from mpa_sim.services.hw_estimator import (CPU_forecasting_model,
+    BATCH_FEATURES, dataFolder, load_cpu_models)
 
 
 PARAMETERS = {
@@ -136,12 +141,52 @@ def test_loadModels():
     print(res)
     assert len(res) == 3
 
+def test_loadModels_shared():
+    model = CPU_forecasting_model(simulation_parameters = PARAMETERS)
+
+    assert model._df is None
+    assert model.loadModels()[0] is fm.loadModels()[0]
+
+
+def test_load_cpu_models_reloads_changed_file(tmp_path):
+    path = str(tmp_path / 'CPU_models.pkl')
+    shutil.copy(os.path.join(dataFolder, 'CPU_models.pkl'), path)
+
+    models = load_cpu_models(path)
+    assert load_cpu_models(path) is models
+
+    os.utime(path, ns=(0, 0))
+    assert load_cpu_models(path) is not models
+
 def test_estimateCPU_Utilization_CU_DU():
     model_CU, model_DU, scaler = fm.loadModels()
     res = fm.estimateCPU_Utilization_CU_DU(model_CU, model_DU, scaler)
     print(res)
     assert len(res) >= 3
 
+def test_estimateCPU_Utilization_CU_DU_batch():
+    model_CU, model_DU, scaler = fm.loadModels()
+    configurations = [
+        [0, 20, 64, 1, 10, 100, 50],
+        [1, 50, 256, 4, 50, 900, 150],
+        [2, 100, 64, 9, 150, 2500, 400],
+    ]
+
+    res = fm.estimateCPU_Utilization_CU_DU_batch(configurations, model_CU,
+        model_DU, scaler)
+
+    for idx, configuration in enumerate(configurations):
+        model = CPU_forecasting_model(simulation_parameters=dict(PARAMETERS,
+            **dict(zip(BATCH_FEATURES, configuration))))
+        expected = model.estimateCPU_Utilization_CU_DU(model_CU, model_DU,
+            scaler)
+        for key, value in expected.items():
+            assert res[key][idx] == pytest.approx(value)
+
+    with pytest.raises(ValueError):
+        fm.estimateCPU_Utilization_CU_DU_batch([[0, 20, 64]], model_CU,
+            model_DU, scaler)
+
      
 test_estimateCPU_Utilization_CU_DU()
 
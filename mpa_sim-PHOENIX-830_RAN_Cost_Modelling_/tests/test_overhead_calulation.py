@@ -0,0 +1,55 @@
+import os
+import pytest
+import pandas as pd
+
+from mpa_sim.services import overhead_calulation
+from mpa_sim.services.overhead_calulation import (overhead_per_server,
+    update_overhead_models, load_overhead_models)
+
+
+@pytest.fixture
+def models(tmpdir, monkeypatch):
+    monkeypatch.setattr(overhead_calulation, '_overhead_models', None)
+    overhead_calulation._overhead.cache_clear()
+
+    rows = [
+        (virtualization, prop, n)
+        for virtualization in range(3)
+        for prop in range(2)
+        for n in (1, 2, 4, 8)
+    ]
+    for offset, dataFile in ((0, 't330.csv'), (100, 't430.csv')):
+        pd.DataFrame([
+            (virtualization, prop, n, offset + 10 * virtualization + prop + n)
+            for virtualization, prop, n in rows
+        ], columns=['virtualization', 'prop_or_not', 'n', 'overhead']).to_csv(
+            str(tmpdir.join(dataFile)), index=False)
+
+    savedModelPath = str(tmpdir.join('overhead_models.pkl'))
+    yield update_overhead_models(dataFolder=str(tmpdir),
+        savedModelPath=savedModelPath), savedModelPath
+
+    overhead_calulation._overhead.cache_clear()
+
+
+def test_overhead_per_server(models):
+    _, savedModelPath = models
+
+    assert overhead_per_server('Dell PowerEdge T330 server', 'Docker', True,
+        4) == 25
+    assert overhead_per_server('Dell PowerEdge T430 server', 'KVM', False,
+        8) == 108
+    assert overhead_calulation._overhead.cache_info().currsize == 2
+
+    assert os.path.exists(savedModelPath)
+    assert set(load_overhead_models(savedModelPath=savedModelPath)) == set(
+        overhead_calulation.SERVERS)
+    assert overhead_per_server('Dell PowerEdge T330 server', 'VirtualBox',
+        False, 2) == 12
+
+
+def test_overhead_per_server_invalid(models):
+    with pytest.raises(ValueError):
+        overhead_per_server('Unknown server', 'KVM', True, 4)
+    with pytest.raises(ValueError):
+        overhead_per_server('Dell PowerEdge T330 server', 'Xen', True, 4)
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from mpa_sim.services.path_loss import (path_loss_calculator,
+    path_loss_calculator_batch, generate_log_normal_dist_value,
+    ShadowFadingBank)
+
+
+DISTANCES = [20, 50, 120, 300, 499, 500, 800, 1500, 4000, 5200, 9000, 12000]
+
+
+@pytest.mark.parametrize('ant_type, ant_height, settlement_type', [
+    ('macro', 30, 'urban'),
+    ('macro', 30, 'suburban'),
+    ('macro', 30, 'rural'),
+    ('micro', 10, 'urban'),
+])
+def test_path_loss_calculator_batch(ant_type, ant_height, settlement_type):
+    distance = np.array(DISTANCES * 2, dtype=float)
+    los = distance < 500
+    indoor = np.arange(len(distance)) % 2 == 0
+    ue_height = np.where(indoor, 1.5, 2.0)
+
+    res, model = path_loss_calculator_batch(3.5, distance, ant_height,
+        ant_type, 20, 20, settlement_type, los, ue_height, 0, indoor, 1, 20)
+
+    assert model == 'etsi_tr_138_901'
+    for idx in range(len(distance)):
+        try:
+            expected, _ = path_loss_calculator(3.5, distance[idx], ant_height,
+                ant_type, 20, 20, settlement_type,
+                'los' if los[idx] else 'nlos', ue_height[idx], 0,
+                indoor[idx], 1, 20)
+        except TypeError:
+            # the scalar model has no value for this case
+            assert np.isnan(res[idx])
+            continue
+        assert res[idx] == expected
+
+
+def test_path_loss_calculator_batch_frequency():
+    with pytest.raises(ValueError):
+        path_loss_calculator_batch(200, [100], 30, 'macro', 20, 20, 'urban',
+            ['los'], 1.5, 0, False, 1, 20)
+
+
+def test_shadow_fading_bank_legacy():
+    bank = ShadowFadingBank()
+    state = np.random.get_state()[1].copy()
+    res = bank.value(3.5, 1, 4, 20, 1)
+    assert (np.random.get_state()[1] == state).all()
+    assert res == generate_log_normal_dist_value(3.5, 1, 4, 20, 1)
+
+
+def test_shadow_fading_bank_seeded():
+    bank = ShadowFadingBank(seed=7, maxsize=2)
+    first = [bank.value(3.5, 1, sigma, 20, 1) for sigma in (4, 6, 8)]
+    assert len(bank._values) == 2
+    second = ShadowFadingBank(seed=7)
+    assert [second.value(3.5, 1, sigma, 20, 1) for sigma in (8, 6, 4)] == first[::-1]
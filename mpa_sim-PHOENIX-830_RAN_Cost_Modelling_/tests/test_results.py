@@ -0,0 +1,100 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mpa_sim.services.results import (LinkBudgetSink, NUMERIC_COLUMNS,
+    CATEGORICAL_COLUMNS)
+
+from tests.test_system_simulator import (PARAMETERS, MODULATION_AND_CODING_LUT,
+    build_manager)
+
+
+def estimate(manager, sink=None):
+    return manager.estimate_link_budget_batch(
+        frequency=3.5, bandwidth=100, generation='5G', ant_type='macro',
+        tranmission_type='1x1', environment='urban',
+        modulation_and_coding_lut=MODULATION_AND_CODING_LUT,
+        simulation_parameters=PARAMETERS, sink=sink,
+        **manager.receiver_arrays())
+
+
+def test_link_budget_sink_batch():
+    manager = build_manager(2000, 'macro')
+    expected = estimate(manager)
+
+    sink = LinkBudgetSink(capacity=4)
+    assert estimate(manager, sink) is sink
+    estimate(manager, sink)
+    res = sink.to_dataframe()
+
+    assert len(sink) == len(res) == 2 * len(expected['sinr'])
+    for key in NUMERIC_COLUMNS:
+        np.testing.assert_array_equal(res[key].values,
+            np.tile(expected[key], 2))
+    for key in CATEGORICAL_COLUMNS:
+        values = res[key].astype(object).where(res[key].notna(), None)
+        assert list(values) == list(expected[key]) * 2
+    assert list(res['id']) == list(expected['id']) * 2
+    assert res.attrs == {'r_model': 'etsi_tr_138_901',
+        'i_model': 'etsi_tr_138_901', 'network_load': PARAMETERS['network_load'],
+        'tranmission_type': '1x1'}
+
+
+def test_link_budget_sink_records():
+    manager = build_manager(2000, 'macro')
+    expected = manager.estimate_link_budget(3.5, 100, '5G', 'macro', '1x1',
+        'urban', MODULATION_AND_CODING_LUT, PARAMETERS)
+
+    sink = manager.estimate_link_budget(3.5, 100, '5G', 'macro', '1x1',
+        'urban', MODULATION_AND_CODING_LUT, PARAMETERS, sink=LinkBudgetSink())
+    res = sink.to_dataframe()
+
+    assert res['modulation'].dtype.name == 'category'
+    assert list(res['type_of_sight']) == [
+        row['type_of_sight'] for row in expected]
+    assert list(res['sinr']) == [row['sinr'] for row in expected]
+    assert list(res['id']) == [row['id'] for row in expected]
+    assert res['id'].is_unique
+    assert res.attrs == {key: expected[0][key] for key in
+        ('r_model', 'i_model', 'network_load', 'tranmission_type')}
+
+
+def test_link_budget_sink_attrs():
+    sink = LinkBudgetSink()
+    results = {key: np.zeros(2) for key in NUMERIC_COLUMNS}
+    results.update({key: np.array([None, None]) for key in CATEGORICAL_COLUMNS})
+
+    sink.append(results, {'network_load': 50})
+    with pytest.raises(ValueError):
+        sink.append(results, {'network_load': 100})
+
+    # without ids the id column is missing rather than dropped
+    assert sink.to_dataframe()['id'].isna().all()
+
+
+def test_link_budget_sink_parquet(tmpdir):
+    pytest.importorskip('pyarrow')
+    manager = build_manager(2000, 'macro')
+    expected = estimate(manager)
+
+    path = str(tmpdir.join('results.parquet'))
+    sink = LinkBudgetSink(capacity=10, path=path)
+    estimate(manager, sink)
+    sink.close()
+
+    res = pd.read_parquet(path)
+    assert sink.rows_written == len(res) == len(expected['sinr'])
+    np.testing.assert_array_equal(res['sinr'].values, expected['sinr'])
+    assert list(res['id']) == list(expected['id'])
+
+    import pyarrow.parquet as pq
+    metadata = pq.read_schema(path).metadata
+    assert json.loads(metadata[b'tranmission_type']) == '1x1'
+    assert json.loads(metadata[b'network_load']) == PARAMETERS['network_load']
+
+
+def test_link_budget_sink_capacity():
+    with pytest.raises(ValueError):
+        LinkBudgetSink(capacity=0)
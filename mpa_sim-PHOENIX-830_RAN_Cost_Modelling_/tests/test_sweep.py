@@ -0,0 +1,36 @@
+import pandas as pd
+
+from mpa_sim.services.sweep import sweep_jobs, run_sweep
+
+from tests.test_system_simulator import PARAMETERS, MODULATION_AND_CODING_LUT
+
+
+def test_sweep_jobs():
+    jobs = sweep_jobs([500, 1000], [(3.5, 100)], ['urban', 'rural'],
+        ['macro'], seed=1)
+
+    assert len(jobs) == 4
+    assert [job['job_id'] for job in jobs] == [0, 1, 2, 3]
+    assert len(set(job['seed'] for job in jobs)) == 4
+    assert jobs == sweep_jobs([500, 1000], [(3.5, 100)], ['urban', 'rural'],
+        ['macro'], seed=1)
+
+
+def test_run_sweep(tmpdir):
+    arguments = ((37.39, -121.97), [500, 1000], [(3.5, 100)],
+        ['urban', 'rural'], ['macro'], '5G', '1x1', MODULATION_AND_CODING_LUT,
+        PARAMETERS)
+
+    serial = str(tmpdir.join('serial.csv'))
+    parallel = str(tmpdir.join('parallel.csv'))
+    run_sweep(*arguments, output_path=serial, receivers_per_site=10, seed=1,
+        max_workers=1)
+    run_sweep(*arguments, output_path=parallel, receivers_per_site=10, seed=1,
+        max_workers=2)
+
+    serial = pd.read_csv(serial)
+    parallel = pd.read_csv(parallel).sort_values('job_id', kind='stable')
+
+    assert len(serial) == 40
+    assert sorted(serial['site_radius'].unique()) == [500, 1000]
+    pd.testing.assert_frame_equal(serial, parallel.reset_index(drop=True))
@@ -0,0 +1,209 @@
+import numpy as np
+import pytest
+
+from mpa_sim.services.generate_hex import generate_site_areas, find_site_locations
+from mpa_sim.services.system_simulator import (SimulationManager,
+    modulation_and_coding_table)
+
+
+PARAMETERS = {
+    'iterations': 20,
+    'seed_value1': 1,
+    'seed_value2': 2,
+    'indoor_users_percentage': 50,
+    'los_breakpoint_m': 500,
+    'tx_macro_baseline_height': 30,
+    'tx_macro_power': 40,
+    'tx_macro_gain': 16,
+    'tx_macro_losses': 1,
+    'tx_micro_baseline_height': 10,
+    'tx_micro_power': 24,
+    'tx_micro_gain': 5,
+    'tx_micro_losses': 1,
+    'rx_gain': 4,
+    'rx_losses': 4,
+    'rx_misc_losses': 4,
+    'rx_height': 1.5,
+    'building_height': 5,
+    'street_width': 20,
+    'above_roof': 0,
+    'network_load': 50,
+    'percentile': 50,
+    'sectorization': 3,
+    'mnos': 2,
+    'asset_lifetime': 10,
+    'discount_rate': 3.5,
+    'opex_percentage_of_capex': 10,
+    'signaling_overhead': 0.18,
+    'modulation_compression': True,
+    'compression_ratio': {
+        'QPSK': 0.06,
+        '16QAM': 0.12,
+        '64QAM': 0.18,
+        '256QAM': 0.25,
+    },
+}
+
+MODULATION_AND_CODING_LUT = [
+    ('5G', '8x8', 1, 'QPSK', 78, 0.30, -6.7),
+    ('5G', '8x8', 2, 'QPSK', 193, 2.05, -4.7),
+    ('5G', '8x8', 3, 'QPSK', 449, 4.42, -2.3),
+    ('5G', '8x8', 4, '16QAM', 378, 6.40, 0.2),
+    ('5G', '8x8', 5, '16QAM', 490, 8.00, 2.4),
+    ('5G', '8x8', 6, '16QAM', 616, 10.82, 4.3),
+    ('5G', '8x8', 7, '64QAM', 466, 12.40, 5.9),
+    ('5G', '8x8', 8, '64QAM', 567, 16.00, 8.1),
+    ('5G', '8x8', 9, '64QAM', 666, 19.00, 10.3),
+    ('5G', '8x8', 10, '64QAM', 772, 22.00, 11.7),
+    ('5G', '8x8', 11, '64QAM', 873, 28.00, 14.1),
+    ('5G', '8x8', 12, '256QAM', 711, 32.00, 16.3),
+    ('5G', '8x8', 13, '256QAM', 797, 38.00, 18.7),
+    ('5G', '8x8', 14, '256QAM', 885, 44.00, 21),
+    ('5G', '8x8', 15, '256QAM', 948, 50.00, 22.7),
+]
+
+POINT = {
+    'type': 'Feature',
+    'geometry': {
+        'type': 'Point',
+        'coordinates': (-13579281.85229575, 4493916.943802611),
+    },
+    'properties': {},
+}
+
+
+def build_manager(site_radius, ant_type):
+    site_area, interfering_site_areas = generate_site_areas(POINT, site_radius)
+    transmitter, interfering_transmitters = find_site_locations(
+        site_area, interfering_site_areas)
+
+    x0, y0 = transmitter[0]['geometry']['coordinates']
+    rng = np.random.RandomState(0)
+    receivers = []
+    for idx, (dx, dy) in enumerate(rng.uniform(-site_radius, site_radius, (25, 2))):
+        receivers.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': (x0 + dx, y0 + dy)},
+            'properties': {
+                'ue_id': 'id_{}'.format(idx),
+                'misc_losses': PARAMETERS['rx_misc_losses'],
+                'gain': PARAMETERS['rx_gain'],
+                'losses': PARAMETERS['rx_losses'],
+                'ue_height': float(PARAMETERS['rx_height']),
+                'indoor': bool(idx % 2),
+            }
+        })
+
+    return SimulationManager(transmitter, interfering_transmitters, ant_type,
+        receivers, site_area, PARAMETERS)
+
+
+@pytest.mark.parametrize('site_radius, ant_type, environment', [
+    (300, 'macro', 'urban'),
+    (1000, 'macro', 'suburban'),
+    (2000, 'macro', 'rural'),
+    (200, 'micro', 'urban'),
+])
+def test_estimate_link_budget_batch(site_radius, ant_type, environment):
+    manager = build_manager(site_radius, ant_type)
+
+    expected = manager.estimate_link_budget(3.5, 100, '5G', ant_type, '1x1',
+        environment, MODULATION_AND_CODING_LUT, PARAMETERS)
+    res = manager.estimate_link_budget_batch(
+        frequency=3.5, bandwidth=100, generation='5G', ant_type=ant_type,
+        tranmission_type='1x1', environment=environment,
+        modulation_and_coding_lut=MODULATION_AND_CODING_LUT,
+        simulation_parameters=PARAMETERS, **manager.receiver_arrays())
+
+    assert len(res['sinr']) == len(expected)
+    for key, values in res.items():
+        for value, row in zip(values, expected):
+            if isinstance(row[key], str) or row[key] is None:
+                assert value == row[key]
+            else:
+                assert value == pytest.approx(row[key])
+
+
+def test_estimate_link_budget_batch_max_interferers():
+    manager = build_manager(300, 'macro')
+    parameters = dict(PARAMETERS, max_interferers=3)
+
+    expected = manager.estimate_link_budget_batch(
+        frequency=3.5, bandwidth=100, generation='5G', ant_type='macro',
+        tranmission_type='1x1', environment='urban',
+        modulation_and_coding_lut=MODULATION_AND_CODING_LUT,
+        simulation_parameters=PARAMETERS, **manager.receiver_arrays())
+    res = manager.estimate_link_budget_batch(
+        frequency=3.5, bandwidth=100, generation='5G', ant_type='macro',
+        tranmission_type='1x1', environment='urban',
+        modulation_and_coding_lut=MODULATION_AND_CODING_LUT,
+        simulation_parameters=parameters, **manager.receiver_arrays())
+    scalar = manager.estimate_link_budget(3.5, 100, '5G', 'macro', '1x1',
+        'urban', MODULATION_AND_CODING_LUT, parameters)
+
+    assert (res['sinr'] == expected['sinr']).all()
+    assert res['ave_distance'] == pytest.approx(
+        [row['ave_distance'] for row in scalar])
+    assert res['ave_inf_pl'] == pytest.approx(
+        [row['ave_inf_pl'] for row in scalar])
+
+
+def test_estimate_link_budget_batch_tied_interferers():
+    manager = build_manager(300, 'macro')
+    x0, y0 = manager.transmitter.coordinates
+    # receivers at the site and on the edge, where interferers tie
+    for receiver, (dx, dy) in zip(manager.receivers.values(),
+        [(0, 0), (150, 0), (0, 0), (-150, 0)]):
+        receiver.coordinates = (x0 + dx, y0 + dy)
+    parameters = dict(PARAMETERS, max_interferers=2)
+
+    res = manager.estimate_link_budget_batch(
+        frequency=3.5, bandwidth=100, generation='5G', ant_type='macro',
+        tranmission_type='1x1', environment='urban',
+        modulation_and_coding_lut=MODULATION_AND_CODING_LUT,
+        simulation_parameters=parameters, **manager.receiver_arrays())
+    scalar = manager.estimate_link_budget(3.5, 100, '5G', 'macro', '1x1',
+        'urban', MODULATION_AND_CODING_LUT, parameters)
+
+    assert res['ave_distance'] == pytest.approx(
+        [row['ave_distance'] for row in scalar])
+    assert res['ave_inf_pl'] == pytest.approx(
+        [row['ave_inf_pl'] for row in scalar])
+
+
+def test_nearest_interferers():
+    manager = build_manager(300, 'macro')
+    coordinates = manager.transmitter.coordinates
+    distance = manager.interferer_distance_matrix([coordinates])[0]
+
+    res = manager.nearest_interferers(coordinates, 2)
+
+    assert len(res) == 2
+    assert manager.nearest_interferers(coordinates) == list(
+        manager.interfering_transmitters.values())
+    for interferer in res:
+        idx = list(manager.interfering_transmitters.values()).index(interferer)
+        assert distance[idx] == pytest.approx(distance.min())
+
+
+def test_modulation_and_coding_table():
+    manager = build_manager(300, 'macro')
+    thresholds = [row[6] for row in MODULATION_AND_CODING_LUT] + [0.30]
+    sinr = np.concatenate([np.arange(-10, 30, 0.05), thresholds, [np.nan]])
+
+    table = modulation_and_coding_table(MODULATION_AND_CODING_LUT, '5G')
+    spectral_efficiency, modulation = table.lookup(sinr)
+
+    assert modulation_and_coding_table(
+        list(MODULATION_AND_CODING_LUT), '5G') is table
+    for idx, value in enumerate(sinr):
+        expected_se = manager.estimate_spectral_efficiency(
+            value, '5G', MODULATION_AND_CODING_LUT)
+        expected_modulation = manager.estimate_modulation(
+            value, '5G', MODULATION_AND_CODING_LUT)
+        assert table.lookup_value(value) == (expected_se, expected_modulation)
+        assert modulation[idx] == expected_modulation
+        if expected_se is None:
+            assert np.isnan(spectral_efficiency[idx])
+        else:
+            assert spectral_efficiency[idx] == expected_se
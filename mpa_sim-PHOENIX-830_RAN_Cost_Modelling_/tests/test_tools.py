@@ -308,3 +308,53 @@ test_cuup_nb_traffic()
 test_cucp_nb_traffic()
 test_core_traffic()
 test_smo_traffic()
+
+def test_throughputs():
+    res = cal.throughputs(mode='FDD')
+    print(res)
+    assert res == {
+        'DL': cal.max_cell_throughput(mode='FDD')['DL'],
+        'UL': cal.max_cell_throughput(mode='FDD')['UL'],
+        'ecpri': cal.ecpri_throughput(),
+        'f1c': cal.f1c_throughput(mode='FDD'),
+        'f1u': cal.f1u_throughput(mode='FDD'),
+        'du_nb': cal.du_nb_traffic(mode='FDD'),
+        'cuup_nb': cal.cuup_nb_traffic(mode='FDD'),
+        'cucp_nb': cal.cucp_nb_traffic(mode='FDD'),
+        'core': cal.core_traffic(mode='FDD'),
+        'smo': cal.smo_traffic(mode='FDD'),
+    }
+
+def test_throughputs_parameter_change():
+    calculator = Calculator(simulation_parameters = dict(PARAMETERS))
+    res = calculator.throughputs()
+    calculator.params['DL_MIMO_Layers'] = 8
+    assert calculator.throughputs()['DL'] == 2 * res['DL']
+    assert calculator.max_cell_throughput()['DL'] == 2 * res['DL']
+    assert calculator.ecpri_throughput() == res['ecpri']
+
+def test_throughput_grid():
+    axes = {
+        'Numerology': [0, 1, 2],
+        'Bandwidth': [5, 20, 100],
+        'DL_MIMO_Layers': [2, 4],
+        'Modulation': [64, 256],
+        'DL_UP_ratio': [0.5, 0.7],
+    }
+    res = cal.throughput_grid(**axes)
+    print(res)
+    assert len(res) == 72
+    assert list(res.index.names) == list(axes)
+
+    for values, row in res.iterrows():
+        calculator = Calculator(simulation_parameters = dict(PARAMETERS, **dict(zip(axes, values))))
+        if (values[1], values[0]) not in calculator.nbr:
+            assert row.isna().all()
+            continue
+        assert row['DL'] == pytest.approx(calculator.max_cell_throughput()['DL'])
+        assert row['UL'] == pytest.approx(calculator.max_cell_throughput()['UL'])
+        assert row['eCPRI'] == pytest.approx(calculator.ecpri_throughput())
+
+def test_throughput_grid_unknown_parameter():
+    with pytest.raises(ValueError):
+        cal.throughput_grid(Frequency = [3.5])